@@ -0,0 +1,607 @@
+import email
+import hashlib
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+from google.oauth2.credentials import Credentials
+from googleapiclient import discovery_cache
+
+from src import google_auth
+from src.drive_api import FOLDER_MIME_TYPE, GOOGLE_DOC_MIME_TYPE
+
+# --- CONFIGURATION ---
+
+# Uploads up to this size are kept so they can be downloaded again; larger ones keep only their size and MD5
+KEPT_CONTENT_LIMIT = 4 * 1024 * 1024
+# Size of the random block that generated (seeded) file contents repeat
+PATTERN_BLOCK_SIZE = 1024 * 1024
+# Errors injected by `error_rate`, as Drive returns them under load: (status, reason, message)
+INJECTED_ERRORS = (
+    (429, 'rateLimitExceeded', 'Rate limit exceeded'),
+    (503, 'backendError', 'Backend Error'),
+)
+# Counters endpoint of the fake server itself; requests to it are not counted
+STATS_PATH = '/_bench/stats'
+BATCH_PATH = '/batch/drive/v3'
+BATCH_BOUNDARY = 'fake_drive_batch'
+SESSION_PREFIX = '/upload-session/'
+FILES_PATH = re.compile(r'^/(?:upload/|resumable/upload/)?drive/v3/files(?:/([^/]+))?(?:/(export))?$')
+DOCUMENT_PATH = re.compile(r'^/v1/documents/([^/]+)$')
+CONTENT_RANGE = re.compile(r'bytes (\*|(\d+)-(\d+))/(\*|\d+)')
+
+# APIs whose discovery documents are pointed at the fake server
+FAKE_APIS = (('drive', 'v3'), ('docs', 'v1'))
+
+# --- FUNCTIONS ---
+
+def connect(url):
+    """
+    Points this process's Google API session at a fake server.
+
+    The bundled discovery documents are rewritten to the server's URL and the
+    session gets a bearer token that never expires, so `get_service` and
+    everything built on it talk to the fake server without an OAuth flow.
+    """
+    for api, version in FAKE_APIS:
+        document = json.loads(discovery_cache.get_static_doc(api, version))
+        document['rootUrl'] = url
+        document['baseUrl'] = url + document['servicePath']
+        google_auth._discovery_docs[f"{api}.{version}"] = document
+    google_auth._session_credentials = Credentials(token='fake-drive')
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+def _header(headers, name):
+    return headers.get(name) or headers.get(name.lower()) or headers.get(name.title())
+
+def _project(item, fields):
+    """Applies a `fields` mask the way Drive does for the flat fields the CLI asks for."""
+    if not fields:
+        return {key: item[key] for key in ('id', 'name', 'mimeType') if key in item}
+    keys = re.split(r'\s*,\s*', fields.strip())
+    return {key: item[key] for key in keys if key in item}
+
+def _files_fields(fields):
+    """Returns the per-file part of a list mask such as "nextPageToken, files(id, name)"."""
+    match = re.search(r'files\(([^)]*)\)', fields or '')
+    return match.group(1) if match else None
+
+def _matches_query(item, query):
+    """Evaluates the subset of the Drive query language the CLI uses."""
+    if 'trashed=false' in query.replace(' ', '') and item.get('trashed'):
+        return False
+    match = re.search(r"name\s*=\s*'((?:[^'\\]|\\.)*)'", query)
+    if match and item['name'] != match.group(1).replace("\\'", "'"):
+        return False
+    match = re.search(r"mimeType\s*=\s*'([^']+)'", query)
+    if match and item['mimeType'] != match.group(1):
+        return False
+    return True
+
+def operation_name(method, path, query):
+    """Names a request after the API method it calls, as `metrics` does on the client side."""
+    if path.startswith(SESSION_PREFIX):
+        return 'drive.files.upload_chunk'
+    if path == BATCH_PATH:
+        return 'drive.batch'
+    if DOCUMENT_PATH.match(path):
+        return 'docs.documents.get'
+    if path == '/drive/v3/changes/startPageToken':
+        return 'drive.changes.getStartPageToken'
+    if path == '/drive/v3/changes':
+        return 'drive.changes.list'
+    match = FILES_PATH.match(path)
+    if not match:
+        return None
+    file_id, action = match.groups()
+    if file_id == 'generateIds':
+        return 'drive.files.generateIds'
+    if action == 'export':
+        return 'drive.files.export'
+    if method == 'GET' and file_id is None:
+        return 'drive.files.list'
+    if method == 'GET':
+        return 'drive.files.get_media' if query.get('alt') == 'media' else 'drive.files.get'
+    return {'POST': 'drive.files.create', 'PATCH': 'drive.files.update', 'DELETE': 'drive.files.delete'}.get(method)
+
+def _error(status, reason='notFound', message='File not found'):
+    body = {'error': {'code': status, 'message': message, 'errors': [{'reason': reason, 'message': message}]}}
+    return status, body, {}
+
+def _document_text(document):
+    """Renders a fake document as plain text, for exports."""
+    lines = []
+    for element in document['body']['content']:
+        runs = element.get('paragraph', {}).get('elements', [])
+        lines.append(''.join(run['textRun']['content'] for run in runs))
+    return ''.join(lines).encode()
+
+def make_document(title, paragraphs, seed=0):
+    """Builds a Docs API document of `paragraphs` paragraphs with some headings, bold text and bullets."""
+    rng = random.Random(seed)
+    words = ['drive', 'sync', 'scene', 'prefab', 'shader', 'texture', 'build', 'asset', 'merge', 'reality']
+    content = []
+    for n in range(paragraphs):
+        text = ' '.join(rng.choice(words) for _ in range(rng.randint(5, 40))) + '\n'
+        paragraph = {
+            'elements': [{'textRun': {'content': text, 'textStyle': {'bold': n % 7 == 0}}}],
+            'paragraphStyle': {'namedStyleType': 'HEADING_2' if n % 20 == 0 else 'NORMAL_TEXT'},
+        }
+        if n % 5 == 4:
+            paragraph['bullet'] = {'listId': 'list', 'nestingLevel': 0}
+        content.append({'paragraph': paragraph})
+    return {
+        'documentId': None, 'title': title, 'body': {'content': content},
+        'lists': {'list': {'listProperties': {'nestingLevels': [{'glyphType': 'DECIMAL'}]}}},
+    }
+
+# --- CLASSES ---
+
+class PatternContent:
+    """
+    Generated file contents: a random block repeated up to `size` bytes.
+
+    Lets the server hold multi-GB files without keeping them in memory, while
+    still serving real bytes with a real MD5 that downloads can verify.
+    """
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self._block = random.Random(seed).randbytes(min(PATTERN_BLOCK_SIZE, max(size, 1)))
+        digest = hashlib.md5()
+        for start in range(0, size, len(self._block)):
+            digest.update(self.read(start, min(size, start + len(self._block))))
+        self.md5 = digest.hexdigest()
+
+    def read(self, start, end):
+        """Returns bytes `start` up to (not including) `end`."""
+        block_size = len(self._block)
+        out = bytearray()
+        while start < end:
+            offset = start % block_size
+            piece = self._block[offset:offset + min(end - start, block_size - offset)]
+            out += piece
+            start += len(piece)
+        return bytes(out)
+
+class BytesContent:
+    """Contents held in memory."""
+
+    def __init__(self, data):
+        self._data = bytes(data)
+        self.size = len(self._data)
+        self.md5 = hashlib.md5(self._data).hexdigest()
+
+    def read(self, start, end):
+        return self._data[start:end]
+
+class Link:
+    """
+    A network link of limited bandwidth shared by every connection.
+
+    Transfers queue behind each other, so concurrent uploads split the
+    bandwidth instead of each getting all of it. No limit without a rate.
+    """
+
+    def __init__(self, bytes_per_second=None):
+        self.rate = bytes_per_second
+        self._lock = threading.Lock()
+        self._free_at = 0.0
+
+    def transfer(self, nbytes):
+        if not self.rate or not nbytes:
+            return
+        with self._lock:
+            start = max(time.monotonic(), self._free_at)
+            self._free_at = start + nbytes / self.rate
+            done = self._free_at
+        time.sleep(max(0.0, done - time.monotonic()))
+
+class DriveStore:
+    """
+    The files, documents and upload sessions of the fake server, plus its request counters.
+
+    Items are plain dicts shaped like Drive v3 file resources; contents are
+    kept separately and only for files small enough or generated on demand.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.files = {}
+        self.children = {}
+        self.contents = {}
+        self.documents = {}
+        self.sessions = {}
+        self.changes = []
+        self._ids = itertools.count(1)
+        self.stats = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {
+                'api_calls': 0, 'http_requests': 0, 'bytes_received': 0, 'bytes_sent': 0,
+                'errors_injected': 0, 'by_operation': {},
+            }
+
+    def count(self, operation):
+        with self.lock:
+            self.stats['api_calls'] += 1
+            by_operation = self.stats['by_operation']
+            by_operation[operation] = by_operation.get(operation, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.stats))
+
+    def new_id(self):
+        return f"fake{next(self._ids):08d}"
+
+    def add(self, name, mime_type, parent_id, content=None, file_id=None):
+        """Adds an item under `parent_id` and returns it; `content` is bytes or a PatternContent."""
+        with self.lock:
+            file_id = file_id or self.new_id()
+            item = {
+                'id': file_id, 'name': name, 'mimeType': mime_type, 'parents': [parent_id] if parent_id else [],
+                'modifiedTime': _now(), 'trashed': False,
+            }
+            self.files[file_id] = item
+            if parent_id:
+                self.children.setdefault(parent_id, set()).add(file_id)
+            if mime_type != FOLDER_MIME_TYPE and not mime_type.startswith('application/vnd.google-apps.'):
+                self.set_content(file_id, BytesContent(content or b'') if not hasattr(content, 'read') else content)
+            self.changes.append((file_id, False))
+            return item
+
+    def add_folder(self, name, parent_id, file_id=None):
+        return self.add(name, FOLDER_MIME_TYPE, parent_id, file_id=file_id)
+
+    def add_document(self, title, parent_id, paragraphs, seed=0):
+        """Adds a Google Doc whose Docs API body has `paragraphs` paragraphs."""
+        with self.lock:
+            item = self.add(title, GOOGLE_DOC_MIME_TYPE, parent_id)
+            document = make_document(title, paragraphs, seed)
+            document['documentId'] = item['id']
+            self.documents[item['id']] = document
+            return item
+
+    def set_content(self, file_id, content, size=None, md5=None):
+        """Sets a file's contents; with `content` None only `size` and `md5` are recorded."""
+        with self.lock:
+            item = self.files[file_id]
+            self.contents[file_id] = content
+            item['size'] = str(content.size if content is not None else size)
+            item['md5Checksum'] = content.md5 if content is not None else md5
+            item['modifiedTime'] = _now()
+
+    def set_parents(self, file_id, parents):
+        with self.lock:
+            for parent_id in self.files[file_id]['parents']:
+                self.children.get(parent_id, set()).discard(file_id)
+            self.files[file_id]['parents'] = parents
+            for parent_id in parents:
+                self.children.setdefault(parent_id, set()).add(file_id)
+
+    def remove(self, file_id):
+        with self.lock:
+            self.set_parents(file_id, [])
+            del self.files[file_id]
+            self.contents.pop(file_id, None)
+            self.documents.pop(file_id, None)
+            self.changes.append((file_id, True))
+
+    def query(self, q):
+        """Returns the items matching a files().list query, in a stable order."""
+        with self.lock:
+            parents = re.findall(r"'([^']+)' in parents", q)
+            if parents:
+                ids = set().union(*(self.children.get(parent_id, ()) for parent_id in parents))
+            else:
+                ids = self.files
+            return [self.files[file_id] for file_id in sorted(ids) if _matches_query(self.files[file_id], q)]
+
+class DriveRequestHandler(BaseHTTPRequestHandler):
+    """Serves the Drive v3 and Docs v1 endpoints the CLI calls, from the server's DriveStore."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def _dispatch(self, method):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if urlparse(self.path).path == STATS_PATH:
+            status, payload, headers = 200, self.store.snapshot(), {}
+        else:
+            time.sleep(self.server.latency)
+            status, payload, headers = self.route(method, self.path, dict(self.headers), body)
+        content_type = headers.pop('Content-Type', 'application/json')
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload).encode()
+
+        if urlparse(self.path).path != STATS_PATH:
+            self.server.link.transfer(len(body) + len(payload))
+            with self.store.lock:
+                self.store.stats['http_requests'] += 1
+                self.store.stats['bytes_received'] += len(body)
+                self.store.stats['bytes_sent'] += len(payload)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def route(self, method, path, headers, body):
+        """Handles one API request (a whole HTTP request or one part of a batch) and returns (status, payload, headers)."""
+        url = urlparse(path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        operation = operation_name(method, url.path, query)
+        if operation is None:
+            return _error(404, 'notFound', f"No route for {method} {url.path}")
+        if operation != 'drive.batch':
+            self.store.count(operation)
+            if self.server.error_rate and random.random() < self.server.error_rate:
+                with self.store.lock:
+                    self.store.stats['errors_injected'] += 1
+                return _error(*random.choice(INJECTED_ERRORS))
+
+        if operation == 'drive.files.upload_chunk':
+            return self._upload_chunk(url.path[len(SESSION_PREFIX):], headers, body)
+        if operation == 'drive.batch':
+            return self._batch(headers, body)
+        if operation == 'docs.documents.get':
+            document = self.store.documents.get(unquote(DOCUMENT_PATH.match(url.path).group(1)))
+            return (200, document, {}) if document else _error(404)
+        if operation == 'drive.changes.getStartPageToken':
+            return 200, {'startPageToken': str(len(self.store.changes))}, {}
+        if operation == 'drive.changes.list':
+            return self._changes(query)
+
+        file_id = FILES_PATH.match(url.path).group(1)
+        file_id = unquote(file_id) if file_id else None
+        if operation == 'drive.files.generateIds':
+            count = int(query.get('count', 10))
+            return 200, {'kind': 'drive#generatedIds', 'space': 'drive', 'ids': [self.store.new_id() for _ in range(count)]}, {}
+        if operation == 'drive.files.list':
+            return self._list(query)
+        if operation == 'drive.files.create':
+            return self._write(None, query, headers, body, url.path)
+        if file_id not in self.store.files:
+            return _error(404, 'notFound', f"File not found: {file_id}")
+        if operation == 'drive.files.get':
+            return 200, _project(self.store.files[file_id], query.get('fields')), {}
+        if operation == 'drive.files.get_media':
+            return self._get_media(file_id, headers)
+        if operation == 'drive.files.export':
+            document = self.store.documents.get(file_id)
+            text = _document_text(document) if document else b''
+            return 200, text, {'Content-Type': query.get('mimeType', 'text/plain')}
+        if operation == 'drive.files.update':
+            return self._write(file_id, query, headers, body, url.path)
+        self.store.remove(file_id)
+        return 204, b'', {}
+
+    def _list(self, query):
+        items = self.store.query(query.get('q', ''))
+        page_size = int(query.get('pageSize', 100))
+        start = int(query.get('pageToken') or 0)
+        fields = _files_fields(query.get('fields'))
+        result = {'files': [_project(item, fields) for item in items[start:start + page_size]]}
+        if start + page_size < len(items):
+            result['nextPageToken'] = str(start + page_size)
+        return 200, result, {}
+
+    def _get_media(self, file_id, headers):
+        content = self.store.contents.get(file_id)
+        if content is None:
+            return _error(404, 'notFound', "The fake server did not keep this file's contents")
+        byte_range = _header(headers, 'Range')
+        if not byte_range:
+            return 200, content.read(0, content.size), {'Content-Type': 'application/octet-stream'}
+        first, _, last = byte_range.split('=', 1)[1].partition('-')
+        first = int(first)
+        last = min(int(last) if last else content.size - 1, content.size - 1)
+        if first >= content.size and content.size:
+            return 416, b'', {'Content-Type': 'application/octet-stream'}
+        data = content.read(first, last + 1)
+        return 206, data, {
+            'Content-Type': 'application/octet-stream',
+            'Content-Range': f"bytes {first}-{first + len(data) - 1}/{content.size}",
+        }
+
+    def _multipart(self, headers, body):
+        message = email.message_from_bytes(
+            b'Content-Type: ' + _header(headers, 'Content-Type').encode() + b'\r\n\r\n' + body
+        )
+        parts = message.get_payload()
+        metadata = json.loads(parts[0].get_payload(decode=True) or b'{}')
+        data = parts[1].get_payload(decode=True) if len(parts) > 1 else b''
+        return metadata, data
+
+    def _write(self, file_id, query, headers, body, path):
+        """Handles files().create (file_id None) and files().update, with or without media."""
+        upload_type = query.get('uploadType') if '/upload/' in path else None
+        if upload_type == 'resumable':
+            session_id = self.store.new_id()
+            total = _header(headers, 'X-Upload-Content-Length')
+            self.store.sessions[session_id] = {
+                'metadata': json.loads(body or b'{}'), 'file_id': file_id, 'query': query,
+                'total': int(total) if total else None, 'received': 0, 'md5': hashlib.md5(), 'data': bytearray(),
+            }
+            host = _header(headers, 'Host')
+            return 200, b'', {'Location': f"http://{host}{SESSION_PREFIX}{session_id}"}
+        if upload_type == 'multipart':
+            metadata, data = self._multipart(headers, body)
+        elif upload_type:
+            metadata, data = {}, body
+        else:
+            metadata, data = json.loads(body or b'{}'), None
+        content = BytesContent(data) if data is not None else None
+        return self._save(file_id, metadata, query, content)
+
+    def _save(self, file_id, metadata, query, content, size=None, md5=None):
+        with self.store.lock:
+            if file_id is None:
+                parents = metadata.get('parents', [])
+                missing = [parent_id for parent_id in parents if parent_id not in self.store.files]
+                if missing:
+                    return _error(404, 'notFound', f"File not found: {missing[0]}")
+                if metadata.get('id') in self.store.files:
+                    return _error(409, 'duplicate', 'A file already exists with the provided ID.')
+                item = self.store.add(
+                    metadata.get('name', 'Untitled'), metadata.get('mimeType', 'application/octet-stream'),
+                    parents[0] if parents else None, file_id=metadata.get('id')
+                )
+                file_id = item['id']
+            else:
+                item = self.store.files[file_id]
+                for key in ('name', 'mimeType'):
+                    if key in metadata:
+                        item[key] = metadata[key]
+                removed = [p for p in query.get('removeParents', '').split(',') if p]
+                added = [p for p in query.get('addParents', '').split(',') if p]
+                if removed or added:
+                    self.store.set_parents(file_id, [p for p in item['parents'] if p not in removed] + added)
+                item['modifiedTime'] = _now()
+                self.store.changes.append((file_id, False))
+            if content is not None or md5 is not None:
+                if content is not None and content.size > KEPT_CONTENT_LIMIT:
+                    content, size, md5 = None, content.size, content.md5
+                self.store.set_content(file_id, content, size, md5)
+            return 200, _project(item, query.get('fields')), {}
+
+    def _upload_chunk(self, session_id, headers, body):
+        session = self.store.sessions.get(session_id)
+        if session is None:
+            return _error(404, 'notFound', 'Upload session expired')
+        match = CONTENT_RANGE.match(_header(headers, 'Content-Range') or '')
+        if match and match.group(4) != '*':
+            session['total'] = int(match.group(4))
+        if match and match.group(1) != '*':
+            if int(match.group(2)) != session['received']:
+                return _error(400, 'badRequest', 'Chunk does not start at the committed offset')
+            session['received'] += len(body)
+            session['md5'].update(body)
+            if session['data'] is not None:
+                session['data'] += body
+                if len(session['data']) > KEPT_CONTENT_LIMIT:
+                    session['data'] = None
+
+        if session['total'] is not None and session['received'] >= session['total']:
+            del self.store.sessions[session_id]
+            content = BytesContent(session['data']) if session['data'] is not None else None
+            return self._save(
+                session['file_id'], session['metadata'], session['query'], content,
+                size=session['received'], md5=session['md5'].hexdigest()
+            )
+        headers = {'Range': f"bytes=0-{session['received'] - 1}"} if session['received'] else {}
+        return 308, b'', headers
+
+    def _changes(self, query):
+        start = int(query.get('pageToken', 0))
+        page_size = int(query.get('pageSize', 100))
+        with self.store.lock:
+            changes = []
+            for file_id, removed in self.store.changes[start:start + page_size]:
+                item = self.store.files.get(file_id)
+                change = {'fileId': file_id, 'removed': removed or item is None}
+                if item is not None:
+                    change['file'] = dict(item)
+                changes.append(change)
+            result = {'changes': changes}
+            if start + page_size < len(self.store.changes):
+                result['nextPageToken'] = str(start + page_size)
+            else:
+                result['newStartPageToken'] = str(len(self.store.changes))
+        return 200, result, {}
+
+    def _batch(self, headers, body):
+        """Runs each part of a multipart/mixed batch as its own API request."""
+        message = email.message_from_bytes(
+            b'Content-Type: ' + _header(headers, 'Content-Type').encode() + b'\r\n\r\n' + body
+        )
+        out = []
+        for part in message.get_payload():
+            raw = part.get_payload(decode=False)
+            if isinstance(raw, list):
+                raw = raw[0].as_string()
+            raw = raw.encode() if isinstance(raw, str) else raw
+            head, _, sub_body = raw.replace(b'\r\n', b'\n').partition(b'\n\n')
+            lines = head.decode().split('\n')
+            method, path = lines[0].split(' ')[:2]
+            sub_headers = dict(line.split(':', 1) for line in lines[1:] if ':' in line)
+            sub_headers = {name.strip().lower(): value.strip() for name, value in sub_headers.items()}
+            status, payload, _ = self.route(method, path, sub_headers, sub_body.rstrip(b'\n'))
+            if isinstance(payload, (dict, list)):
+                payload = json.dumps(payload).encode()
+            content_id = 'response-' + part['Content-ID'].strip('<>')
+            out.append(
+                f"--{BATCH_BOUNDARY}\r\nContent-Type: application/http\r\nContent-ID: <{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+                .encode() + payload + b"\r\n"
+            )
+        data = b''.join(out) + f"--{BATCH_BOUNDARY}--\r\n".encode()
+        return 200, data, {'Content-Type': f"multipart/mixed; boundary={BATCH_BOUNDARY}"}
+
+class FakeDrive:
+    """
+    An in-process HTTP stand-in for the Drive v3 and Docs v1 APIs, for benchmarks.
+
+    Serves files list/get/create/update/delete, get_media with ranges,
+    exports, generateIds, resumable uploads, the Changes API, batch requests
+    and documents.get on a local port. `latency` (seconds) is added to every
+    HTTP request, `bandwidth` (bytes/s) caps a link shared by all connections,
+    and `error_rate` makes that fraction of API calls fail with 429 or 503.
+    """
+
+    def __init__(self, latency=0.0, bandwidth=None, error_rate=0.0):
+        self.store = DriveStore()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), DriveRequestHandler)
+        self.server.daemon_threads = True
+        self.server.store = self.store
+        self.server.latency = latency
+        self.server.link = Link(bandwidth)
+        self.server.error_rate = error_rate
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-drive', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,393 @@
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+import urllib.request
+
+try:
+    import resource
+except ImportError:
+    # Windows: peak RSS is not reported
+    resource = None
+
+from bench.fake_drive import FakeDrive, PatternContent, connect
+from reality_merge import _byte_rate
+from src.drive_api import FOLDER_MIME_TYPE
+from src.drive_commands import ROOT_FOLDER_ID
+from src.transfer import DEFAULT_JOBS, DEFAULT_ORDER, format_bytes
+from src.watch import DEFAULT_DEBOUNCE
+
+# --- CONFIGURATION ---
+
+# Drive folder the upload scenarios sync into, below ROOT_FOLDER_ID
+DEST_FOLDER = 'bench'
+# Rate ceiling of the client in benchmarks: high enough that the code, not the limiter, is measured
+BENCH_MAX_RPS = 1000.0
+# Slowdown (as a fraction) beyond which --compare reports a regression
+DEFAULT_TOLERANCE = 0.15
+# Options that change what a run measures; saved with the results and checked by --compare
+RUN_SETTINGS = ('scale', 'jobs', 'max_rps', 'latency', 'bandwidth', 'error_rate')
+
+# Scenario sizes at --scale 1
+SMALL_FILES = 10000
+SMALL_FILES_PER_FOLDER = 100
+SMALL_FILE_SIZES = (1024, 16 * 1024)
+LARGE_FILES = 3
+LARGE_FILE_SIZE = 2 * 1024 ** 3
+DEEP_TREE_DEPTH = 10
+DEEP_TREE_FANOUT = 2
+DEEP_TREE_FILES_PER_FOLDER = 2
+DOWNLOAD_FILES = 2
+DOWNLOAD_FILE_SIZE = 1024 ** 3
+INBOX_FILES = 500
+INBOX_FILE_SIZES = (4 * 1024, 64 * 1024)
+INBOX_DOCS = 100
+INBOX_DOC_PARAGRAPHS = 200
+# Random bytes at the start of generated large files; the rest is a sparse hole
+LARGE_FILE_HEADER = 64 * 1024
+
+# --- FUNCTIONS ---
+
+def _scaled(count, scale):
+    return max(1, round(count * scale))
+
+def _peak_rss():
+    """Returns the peak resident set size of this process in bytes, or None where it is unknown."""
+    # ru_maxrss survives exec on Linux, so a spawned child would inherit its parent's peak; VmHWM starts afresh
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _server_stats(url):
+    with urllib.request.urlopen(url.rstrip('/') + '/_bench/stats') as response:
+        return json.load(response)
+
+def _upload_args(local_path, options):
+    """Returns the arguments 'drive upload' would parse for a plain sync of `local_path`."""
+    return {
+        'local_path': local_path, 'dest_folder': DEST_FOLDER, 'jobs': options.jobs, 'chunk_size': None,
+        'order': DEFAULT_ORDER, 'refresh_index': False, 'exclude': [], 'gitignore': False, 'explain': False,
+        'dry_run': False, 'save_plan': None, 'watch': False, 'debounce': DEFAULT_DEBOUNCE,
+    }
+
+def _write_small_files(root, count, rng):
+    """Writes `count` small random files, SMALL_FILES_PER_FOLDER to a folder, and returns their total size."""
+    total = 0
+    for n in range(count):
+        folder = os.path.join(root, f"dir{n // SMALL_FILES_PER_FOLDER:04d}")
+        os.makedirs(folder, exist_ok=True)
+        size = rng.randint(*SMALL_FILE_SIZES)
+        with open(os.path.join(folder, f"file{n:05d}.bin"), 'wb') as f:
+            f.write(rng.randbytes(size))
+        total += size
+    return total
+
+def _write_large_file(path, size, rng):
+    """Writes a file of `size` bytes that is random at the start and sparse after, so it costs no disk space."""
+    with open(path, 'wb') as f:
+        f.write(rng.randbytes(min(size, LARGE_FILE_HEADER)))
+        f.truncate(size)
+
+def _uploaded_files(drive):
+    with drive.store.lock:
+        return sum(1 for item in drive.store.files.values() if item['mimeType'] != FOLDER_MIME_TYPE and 'md5Checksum' in item)
+
+def prepare_small_files(drive, work_dir, options):
+    """A first upload of many small files spread over many folders."""
+    count = _scaled(SMALL_FILES, options.scale)
+    root = os.path.join(work_dir, 'small')
+    _write_small_files(root, count, random.Random(1))
+    return {
+        'files': count, 'setup': [],
+        'commands': [('handle_upload', _upload_args(root, options), work_dir)],
+        'check': lambda: _uploaded_files(drive) == count or f"{_uploaded_files(drive)} of {count} files on the server",
+    }
+
+def prepare_large_files(drive, work_dir, options):
+    """A first upload of a few multi-GB files, through resumable sessions."""
+    count = LARGE_FILES
+    size = _scaled(LARGE_FILE_SIZE, options.scale)
+    root = os.path.join(work_dir, 'large')
+    os.makedirs(root)
+    rng = random.Random(2)
+    for n in range(count):
+        _write_large_file(os.path.join(root, f"big{n}.bin"), size, rng)
+    return {
+        'files': count, 'setup': [],
+        'commands': [('handle_upload', _upload_args(root, options), work_dir)],
+        'check': lambda: _uploaded_files(drive) == count or f"{_uploaded_files(drive)} of {count} files on the server",
+    }
+
+def prepare_deep_tree(drive, work_dir, options):
+    """A first upload of a deep, branching folder tree with a few files in every folder."""
+    # Every level multiplies the tree by the fan-out, so scaling takes levels off (or adds them)
+    depth = max(1, DEEP_TREE_DEPTH + round(math.log(options.scale, DEEP_TREE_FANOUT)))
+    root = os.path.join(work_dir, 'deep')
+    rng = random.Random(3)
+    count = 0
+    level = [root]
+    for _ in range(depth):
+        next_level = []
+        for folder in level:
+            os.makedirs(folder, exist_ok=True)
+            for n in range(DEEP_TREE_FILES_PER_FOLDER):
+                with open(os.path.join(folder, f"file{n}.txt"), 'wb') as f:
+                    f.write(rng.randbytes(rng.randint(*SMALL_FILE_SIZES)))
+                count += 1
+            next_level.extend(os.path.join(folder, f"sub{n}") for n in range(DEEP_TREE_FANOUT))
+        level = next_level
+    return {
+        'files': count, 'setup': [],
+        'commands': [('handle_upload', _upload_args(root, options), work_dir)],
+        'check': lambda: _uploaded_files(drive) == count or f"{_uploaded_files(drive)} of {count} files on the server",
+    }
+
+def prepare_noop_resync(drive, work_dir, options):
+    """A second upload of the small-files tree, with nothing changed since the first."""
+    count = _scaled(SMALL_FILES, options.scale)
+    root = os.path.join(work_dir, 'resync')
+    _write_small_files(root, count, random.Random(1))
+    upload = ('handle_upload', _upload_args(root, options), work_dir)
+    return {
+        'files': count, 'setup': [upload], 'commands': [upload],
+        'check': lambda: _uploaded_files(drive) == count or f"{_uploaded_files(drive)} of {count} files on the server",
+    }
+
+def prepare_download(drive, work_dir, options):
+    """Downloads of a few large files, one after another, in ranged chunks."""
+    size = _scaled(DOWNLOAD_FILE_SIZE, options.scale)
+    out_dir = os.path.join(work_dir, 'downloads')
+    os.makedirs(out_dir)
+    commands = []
+    names = []
+    for n in range(DOWNLOAD_FILES):
+        item = drive.store.add(f"download{n}.bin", 'application/octet-stream', ROOT_FOLDER_ID, PatternContent(size, seed=n))
+        commands.append(('handle_download', {'file_id': item['id'], 'chunk_size': None}, out_dir))
+        names.append(item['name'])
+
+    def check():
+        done = [name for name in names if os.path.isfile(os.path.join(out_dir, name))]
+        return len(done) == len(names) or f"{len(done)} of {len(names)} files downloaded"
+    return {'files': DOWNLOAD_FILES, 'setup': [], 'commands': commands, 'check': check}
+
+def prepare_process_inbox(drive, work_dir, options):
+    """'drive process' on an inbox of binary files and Google Docs, which are downloaded and then deleted."""
+    rng = random.Random(4)
+    inbox = drive.store.add_folder('inbox', ROOT_FOLDER_ID)
+    files = _scaled(INBOX_FILES, options.scale)
+    docs = _scaled(INBOX_DOCS, options.scale)
+    for n in range(files):
+        drive.store.add(f"upload{n:04d}.bin", 'application/octet-stream', inbox['id'], rng.randbytes(rng.randint(*INBOX_FILE_SIZES)))
+    for n in range(docs):
+        drive.store.add_document(f"Notes {n:04d}", inbox['id'], INBOX_DOC_PARAGRAPHS, seed=n)
+    out_dir = os.path.join(work_dir, 'processed')
+    os.makedirs(out_dir)
+    args = {'folder_id': inbox['id'], 'jobs': options.jobs, 'order': DEFAULT_ORDER, 'via_export': False}
+
+    def check():
+        left = len(drive.store.children.get(inbox['id'], ()))
+        return not left or f"{left} file(s) left in the inbox"
+    return {'files': files + docs, 'setup': [], 'commands': [('handle_process', args, out_dir)], 'check': check}
+
+SCENARIOS = {
+    'small-files': prepare_small_files,
+    'large-files': prepare_large_files,
+    'deep-tree': prepare_deep_tree,
+    'noop-resync': prepare_noop_resync,
+    'download': prepare_download,
+    'process-inbox': prepare_process_inbox,
+}
+
+def run_commands(url, commands, max_rps, verbose, results):
+    """
+    Runs drive command handlers against the fake server and puts their timing on `results`.
+
+    This is the body of a fresh child process, so the peak RSS it reports
+    belongs to the CLI code alone and not to the fake server or to earlier
+    scenarios. Output of the handlers is hidden unless `verbose`.
+    """
+    try:
+        from src import drive_commands
+        from src.rate_limit import configure
+
+        connect(url)
+        configure(max_rps)
+        before = _server_stats(url)
+        started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if verbose else devnull):
+            for handler, args, cwd in commands:
+                os.chdir(cwd)
+                getattr(drive_commands, handler)(argparse.Namespace(**args))
+        seconds = time.perf_counter() - started
+        after = _server_stats(url)
+        server = {key: after[key] - before[key] for key in after if key != 'by_operation'}
+        server['by_operation'] = {
+            name: count - before['by_operation'].get(name, 0) for name, count in after['by_operation'].items()
+            if count != before['by_operation'].get(name, 0)
+        }
+        results.put({'seconds': seconds, 'server': server, 'peak_rss': _peak_rss()})
+    except BaseException:
+        results.put({'error': traceback.format_exc()})
+
+def _run_in_child(url, commands, options):
+    """Runs commands in a new process and returns what it reported."""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=run_commands, args=(url, commands, options.max_rps, options.verbose, results))
+    process.start()
+    try:
+        while True:
+            try:
+                return results.get(timeout=1.0)
+            except queue.Empty:
+                if not process.is_alive():
+                    return {'error': f"The benchmark process exited with code {process.exitcode}."}
+    finally:
+        process.join()
+
+def run_scenario(name, options):
+    """Prepares one scenario against a new fake server, runs it and returns its result."""
+    work_dir = tempfile.mkdtemp(prefix=f"bench_{name}_", dir=options.work_dir)
+    try:
+        with FakeDrive(latency=options.latency / 1000, bandwidth=options.bandwidth, error_rate=options.error_rate) as drive:
+            drive.store.add_folder('root', None, file_id=ROOT_FOLDER_ID)
+            scenario = SCENARIOS[name](drive, work_dir, options)
+            for command in scenario['setup']:
+                result = _run_in_child(drive.url, [command], options)
+                if 'error' in result:
+                    return {'scenario': name, 'error': result['error']}
+
+            result = _run_in_child(drive.url, scenario['commands'], options)
+            if 'error' in result:
+                return {'scenario': name, 'error': result['error']}
+            problem = scenario['check']()
+            seconds = result['seconds']
+            server = result['server']
+            transferred = server['bytes_received'] + server['bytes_sent']
+            return {
+                'scenario': name,
+                'files': scenario['files'],
+                'seconds': round(seconds, 3),
+                'files_per_second': round(scenario['files'] / seconds, 2),
+                'mb_per_second': round(transferred / seconds / 1024 ** 2, 2),
+                'api_calls': server['api_calls'],
+                'http_requests': server['http_requests'],
+                'bytes_transferred': transferred,
+                'errors_injected': server['errors_injected'],
+                'peak_rss': result['peak_rss'],
+                'calls_by_operation': server['by_operation'],
+                'problem': None if problem is True else problem,
+            }
+    finally:
+        if options.keep:
+            print(f"Kept the files of '{name}' in '{work_dir}'.")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+def print_results(results):
+    print(f"\n{'Scenario':<14} {'Files':>7} {'Time':>9} {'Files/s':>9} {'MB/s':>8} {'API calls':>10} {'HTTP reqs':>10} {'Peak RSS':>10}")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['scenario']:<14} failed")
+            continue
+        rss = format_bytes(result['peak_rss']) if result['peak_rss'] is not None else 'n/a'
+        print(
+            f"{result['scenario']:<14} {result['files']:>7} {result['seconds']:>8.2f}s {result['files_per_second']:>9.1f} "
+            f"{result['mb_per_second']:>8.1f} {result['api_calls']:>10} {result['http_requests']:>10} {rss:>10}"
+        )
+    for result in results:
+        if result.get('error'):
+            print(f"\n'{result['scenario']}' failed:\n{result['error']}")
+        elif result.get('problem'):
+            print(f"\nWarning: '{result['scenario']}' did not finish its work: {result['problem']}.")
+
+def compare_results(results, baseline, tolerance):
+    """Compares results with a saved run and returns a description of each regression."""
+    previous = {result['scenario']: result for result in baseline['results'] if 'error' not in result}
+    regressions = []
+    for result in results:
+        old = previous.get(result['scenario'])
+        if old is None or 'error' in result or old['files'] != result['files']:
+            continue
+        name = result['scenario']
+        if result['files_per_second'] < old['files_per_second'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['files_per_second']:.1f} files/s, was {old['files_per_second']:.1f}")
+        if result['api_calls'] > old['api_calls'] * (1 + tolerance):
+            regressions.append(f"{name}: {result['api_calls']} API calls, was {old['api_calls']}")
+        if result['peak_rss'] and old['peak_rss'] and result['peak_rss'] > old['peak_rss'] * (1 + tolerance):
+            regressions.append(f"{name}: peak RSS {format_bytes(result['peak_rss'])}, was {format_bytes(old['peak_rss'])}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the drive commands against a local fake Drive server")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiplies file counts and sizes, e.g. 0.01 for a quick smoke run")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help=f"Parallel transfers (default: {DEFAULT_JOBS})")
+    parser.add_argument("--max-rps", type=float, default=BENCH_MAX_RPS,
+                        help=f"Client API request ceiling (default: {BENCH_MAX_RPS:g})")
+    parser.add_argument("--latency", type=float, default=0.0, help="Milliseconds the server adds to every request")
+    parser.add_argument("--bandwidth", type=_byte_rate, default=None,
+                        help="Server link speed in bytes per second, e.g. 10M (default: unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of API calls that fail with 429 or 503, e.g. 0.02")
+    parser.add_argument("--json", metavar="FILE", help="Save the results as JSON")
+    parser.add_argument("--compare", metavar="FILE", help="Compare with results saved by --json; exits 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Slowdown allowed by --compare, as a fraction (default: {DEFAULT_TOLERANCE:g})")
+    parser.add_argument("--work-dir", help="Where to generate the local files (default: the system temp directory)")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated files")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the drive commands")
+    options = parser.parse_args()
+    unknown = [name for name in options.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+
+    results = []
+    for name in options.scenarios or list(SCENARIOS):
+        print(f"Running '{name}'...")
+        results.append(run_scenario(name, options))
+    print_results(results)
+
+    if options.json:
+        config = {key: getattr(options, key) for key in RUN_SETTINGS}
+        with open(options.json, 'w', encoding='utf-8') as f:
+            json.dump({'config': config, 'created_at': time.time(), 'results': results}, f, indent=1)
+        print(f"\nSaved the results to '{options.json}'.")
+    failed = any(result.get('error') or result.get('problem') for result in results)
+    if options.compare:
+        with open(options.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        changed = [key for key in RUN_SETTINGS if baseline['config'].get(key) != getattr(options, key)]
+        if changed:
+            print(f"\nWarning: '{options.compare}' was run with different {', '.join(changed)}; the numbers may not be comparable.")
+        regressions = compare_results(results, baseline, options.tolerance)
+        if regressions:
+            print(f"\nRegressions against '{options.compare}':")
+            for regression in regressions:
+                print(f"  {regression}")
+        else:
+            print(f"\nNo regressions against '{options.compare}'.")
+        failed = failed or bool(regressions)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
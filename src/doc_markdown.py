@@ -0,0 +1,116 @@
+# --- CONFIGURATION ---
+
+# Text run fields the converter renders
+TEXT_RUN_FIELDS = "textRun(content,textStyle(bold,italic,strikethrough,link/url))"
+PARAGRAPH_FIELDS = f"paragraph(elements({TEXT_RUN_FIELDS}),paragraphStyle/namedStyleType,bullet(listId,nestingLevel))"
+# Partial-response mask for documents().get: only what the converter renders
+DOC_FIELDS = f"title,lists,body/content({PARAGRAPH_FIELDS},table/tableRows/tableCells/content({PARAGRAPH_FIELDS}))"
+
+# Markdown prefixes of the Docs paragraph styles that are rendered as headings
+HEADING_PREFIXES = {
+    'SUBTITLE': '##',
+    'HEADING_1': '#',
+    'HEADING_2': '##',
+    'HEADING_3': '###',
+    'HEADING_4': '####',
+    'HEADING_5': '#####',
+    'HEADING_6': '######',
+}
+# List glyph types that number their items; every other list is rendered with bullets
+ORDERED_GLYPH_TYPES = {'DECIMAL', 'ZERO_DECIMAL', 'UPPER_ALPHA', 'ALPHA', 'UPPER_ROMAN', 'ROMAN'}
+# Indentation per list nesting level
+LIST_INDENT = "    "
+
+# --- FUNCTIONS ---
+
+def doc_file_name(title):
+    """Returns the Markdown file name used for a document title."""
+    return f"{title.replace(' ', '_')}.md"
+
+def render_text_run(text_run):
+    """Renders one text run as inline Markdown; whitespace-only runs are kept as they are."""
+    content = text_run.get('content', '').strip('\n')
+    text = content.strip()
+    if not text:
+        return content
+    style = text_run.get('textStyle', {})
+    url = style.get('link', {}).get('url')
+    if url:
+        text = f"[{text}]({url})"
+    if style.get('italic'):
+        text = f"*{text}*"
+    if style.get('bold'):
+        text = f"**{text}**"
+    if style.get('strikethrough'):
+        text = f"~~{text}~~"
+    # Emphasis markers only work hugging the text, so surrounding spaces stay outside
+    leading = content[:len(content) - len(content.lstrip())]
+    trailing = content[len(content.rstrip()):]
+    return f"{leading}{text}{trailing}"
+
+def render_inline(paragraph):
+    """Renders the text of a paragraph as a single line of inline Markdown."""
+    return "".join(
+        render_text_run(element['textRun']) for element in paragraph.get('elements', []) if 'textRun' in element
+    ).rstrip()
+
+def _list_prefix(bullet, lists):
+    """Returns the indented list marker of a bulleted paragraph."""
+    level = bullet.get('nestingLevel', 0)
+    levels = lists.get(bullet.get('listId'), {}).get('listProperties', {}).get('nestingLevels', [])
+    glyph_type = levels[level].get('glyphType') if level < len(levels) else None
+    marker = "1." if glyph_type in ORDERED_GLYPH_TYPES else "*"
+    return f"{LIST_INDENT * level}{marker} "
+
+def _write_paragraph(out, paragraph, lists):
+    """Writes one body paragraph: a list item, a heading or a plain paragraph."""
+    line = render_inline(paragraph)
+    if not line.strip():
+        out.write("\n")
+        return
+
+    named_style = paragraph.get('paragraphStyle', {}).get('namedStyleType')
+    if paragraph.get('bullet') is not None:
+        out.write(f"{_list_prefix(paragraph['bullet'], lists)}{line}\n")
+    elif named_style == 'TITLE':
+        # The title is already written at the top of the file
+        pass
+    elif named_style in HEADING_PREFIXES:
+        out.write(f"{HEADING_PREFIXES[named_style]} {line}\n\n")
+    else:
+        out.write(f"{line}\n\n")
+
+def _render_cell(cell):
+    """Renders a table cell as one line, joining its paragraphs with <br>."""
+    lines = []
+    for element in cell.get('content', []):
+        if 'paragraph' in element:
+            line = render_inline(element['paragraph']).strip()
+            if line:
+                lines.append(line.replace('|', '\\|'))
+    return "<br>".join(lines)
+
+def _write_table(out, table):
+    """Writes a table as a Markdown pipe table with its first row as the header."""
+    for n, row in enumerate(table.get('tableRows', [])):
+        cells = [_render_cell(cell) for cell in row.get('tableCells', [])]
+        out.write(f"| {' | '.join(cells)} |\n")
+        if n == 0:
+            out.write(f"|{'---|' * len(cells)}\n")
+    out.write("\n")
+
+def write_markdown(document, out):
+    """
+    Converts a Docs API document to Markdown, writing it element by element to `out`.
+
+    The output is never assembled in memory, so the cost stays linear in the
+    size of the document. Paragraphs, headings, nested bulleted and numbered
+    lists, and tables are rendered; other structural elements are skipped.
+    """
+    lists = document.get('lists', {})
+    out.write(f"# {document.get('title', 'Untitled')}\n\n")
+    for element in document.get('body', {}).get('content', []):
+        if 'paragraph' in element:
+            _write_paragraph(out, element['paragraph'], lists)
+        elif 'table' in element:
+            _write_table(out, element['table'])
@@ -0,0 +1,190 @@
+import os
+import time
+
+from googleapiclient.errors import HttpError
+
+from src.metrics import metrics
+from src.rate_limit import backoff_delay, bandwidth, limiter
+from src.sync_manifest import file_md5
+
+# --- CONFIGURATION ---
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+GOOGLE_DOC_MIME_TYPE = 'application/vnd.google-apps.document'
+# Largest page size accepted by files().list
+DEFAULT_PAGE_SIZE = 1000
+# Per-file fields requested by listings unless the caller asks for more
+DEFAULT_FILE_FIELDS = "id, name, mimeType"
+# Per-file fields needed to decide whether a synced file changed
+SYNC_FILE_FIELDS = "id, name, mimeType, modifiedTime, md5Checksum, size"
+# Bytes fetched by each ranged download request
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# Suffix of the temporary file a download streams into
+PARTIAL_SUFFIX = '.part'
+# Export formats of Google Docs, by the file extension they are saved with
+DOC_EXPORT_MIME_TYPES = {'md': 'text/markdown', 'txt': 'text/plain'}
+# Most IDs a single files().generateIds call hands out
+GENERATE_IDS_LIMIT = 1000
+# HTTP statuses that are worth retrying
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+# 403 reasons that mean "slow down" rather than "forbidden"
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded', 'sharingRateLimitExceeded')
+# 403 reasons that mean a quota ran out, which re-authenticating cannot fix
+QUOTA_REASONS = ('dailyLimitExceeded', 'quotaExceeded', 'storageQuotaExceeded')
+# Retries for a single call before its error is raised
+MAX_RETRIES = 5
+
+# --- FUNCTIONS ---
+
+def execute_with_retry(request, max_retries=MAX_RETRIES, cost=1):
+    """
+    Executes a Google API request through the shared rate limiter.
+
+    Throttling (403 rate limits, 429), server errors and timeouts are retried
+    with exponential backoff and jitter, and throttling also slows the limiter
+    down for every thread. `cost` is the number of API calls the request
+    stands for, e.g. the size of a batch. Each call is recorded in `metrics`
+    under its API method, with the time spent waiting for the limiter.
+    """
+    retries = 0
+    with metrics.span(getattr(request, 'methodId', None) or 'drive.batch', 'api', calls=cost) as span:
+        while True:
+            waited = time.perf_counter()
+            limiter.acquire(cost)
+            span['wait'] = span.get('wait', 0.0) + time.perf_counter() - waited
+            try:
+                response = request.execute()
+                limiter.on_success()
+                span['bytes'] = len(getattr(request, 'body', None) or b'') + (len(response) if isinstance(response, bytes) else 0)
+                return response
+            except HttpError as err:
+                span['status'] = err.resp.status
+                if not is_retryable_error(err) or retries >= max_retries:
+                    if retries:
+                        print("\nOperation failed after multiple retries.")
+                    raise
+                limiter.on_throttle()
+                span['throttled'] = span.get('throttled', 0) + 1
+                problem = f"API returned {err.resp.status}"
+            except (TimeoutError, ConnectionError):
+                if retries >= max_retries:
+                    print("\nOperation failed after multiple retries.")
+                    raise
+                problem = "Operation timed out"
+            retries += 1
+            span['retries'] = retries
+            delay = backoff_delay(retries)
+            print(f"\n{problem}. Retrying in {delay:.1f}s... (Attempt {retries})")
+            time.sleep(delay)
+
+def _error_reasons(err):
+    """Returns the set of `reason` codes in an HttpError's details."""
+    return {detail.get('reason') for detail in (err.error_details or []) if isinstance(detail, dict)}
+
+def is_retryable_error(err):
+    """Checks whether an HttpError is a throttling or server error that may succeed on retry."""
+    status = err.resp.status
+    if status in RETRYABLE_STATUSES:
+        return True
+    if status == 403:
+        return bool(_error_reasons(err) & set(RATE_LIMIT_REASONS))
+    return False
+
+def needs_reauth(err):
+    """Checks whether an HttpError points at stale credentials or permissions rather than quota or server trouble."""
+    status = err.resp.status
+    if status == 401:
+        return True
+    if status in (403, 404):
+        return not _error_reasons(err) & set(RATE_LIMIT_REASONS + QUOTA_REASONS)
+    return False
+
+def iter_drive_files(service, query, fields=DEFAULT_FILE_FIELDS, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Yields every file matching `query`, following `nextPageToken` lazily.
+
+    A page is only requested once the caller has consumed the previous one, so
+    memory stays flat on huge folders and output can start after the first
+    page. `fields` is the per-file projection, e.g. "id, name".
+    """
+    page_token = None
+    while True:
+        request = service.files().list(
+            q=query,
+            pageSize=page_size,
+            pageToken=page_token,
+            fields=f"nextPageToken, files({fields})",
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True
+        )
+        results = execute_with_retry(request)
+        yield from results.get('files', [])
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            return
+
+def iter_folder_children(service, folder_id, fields=DEFAULT_FILE_FIELDS, page_size=DEFAULT_PAGE_SIZE):
+    """Yields the non-trashed direct children of a Drive folder."""
+    query = f"'{folder_id}' in parents and trashed=false"
+    return iter_drive_files(service, query, fields=fields, page_size=page_size)
+
+def download_file(service, file_id, dest_path, size=None, md5=None, chunk_size=DEFAULT_DOWNLOAD_CHUNK_SIZE):
+    """
+    Streams a Drive file to `dest_path` in ranged chunks and returns True on success.
+
+    Chunks are appended to `dest_path + '.part'`, which is renamed over the
+    destination once complete. If a partial file is left over from an
+    interrupted run, the download resumes from its length with an HTTP Range
+    request. When `md5` is known, the finished file is verified against it.
+    """
+    part_path = dest_path + PARTIAL_SUFFIX
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if size is not None and offset > size:
+        offset = 0
+    if offset:
+        print(f"Resuming download at {offset} of {size if size is not None else '?'} bytes.")
+
+    with open(part_path, 'ab' if offset else 'wb') as f:
+        while size is None or offset < size:
+            bandwidth.consume(chunk_size if size is None else min(chunk_size, size - offset))
+            request = service.files().get_media(fileId=file_id, supportsAllDrives=True)
+            request.headers['range'] = f"bytes={offset}-{offset + chunk_size - 1}"
+            chunk = execute_with_retry(request)
+            if not chunk:
+                break
+            f.write(chunk)
+            offset += len(chunk)
+            if size:
+                print(f"Download {int(offset * 100 / size)}%.")
+            if len(chunk) < chunk_size:
+                break
+
+    if md5 and file_md5(part_path) != md5:
+        # The remote file changed since the partial download started; start over next time
+        os.remove(part_path)
+        print(f"\nDownloaded data for '{dest_path}' does not match the remote checksum.")
+        return False
+
+    os.replace(part_path, dest_path)
+    return True
+
+def generate_ids(service, count):
+    """Reserves `count` file IDs for creates, in as few files().generateIds calls as possible."""
+    ids = []
+    while len(ids) < count:
+        request = service.files().generateIds(count=min(GENERATE_IDS_LIMIT, count - len(ids)), space='drive', type='files')
+        ids.extend(execute_with_retry(request)['ids'])
+    return ids
+
+def export_file(service, file_id, dest_path, mime_type):
+    """
+    Exports a Google Workspace file through Drive in the given format and saves it to `dest_path`.
+
+    Drive renders the export server-side and caps it at 10 MB, so the body is
+    written out in one piece, via a partial file that replaces `dest_path` at the end.
+    """
+    content = execute_with_retry(service.files().export_media(fileId=file_id, mimeType=mime_type))
+    part_path = dest_path + PARTIAL_SUFFIX
+    with open(part_path, 'wb') as f:
+        f.write(content)
+    os.replace(part_path, dest_path)
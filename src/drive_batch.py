@@ -0,0 +1,55 @@
+import time
+
+from googleapiclient.errors import HttpError
+
+from src.drive_api import execute_with_retry, is_retryable_error
+from src.rate_limit import backoff_delay, limiter
+
+# --- CONFIGURATION ---
+
+# Drive accepts at most 100 calls in one batch request
+BATCH_LIMIT = 100
+# Times a failed sub-request is sent again in a later batch
+MAX_BATCH_RETRIES = 3
+
+# --- FUNCTIONS ---
+
+def execute_batch(service, requests, batch_size=BATCH_LIMIT, max_retries=MAX_BATCH_RETRIES):
+    """
+    Runs metadata-only requests through Drive batch requests.
+
+    `requests` is an iterable of `(key, request)` pairs. The result maps every
+    key to `(response, error)`, where `error` is the HttpError of a failed
+    sub-request or None. Only sub-requests that failed with a retryable error
+    are sent again, in a later batch, after an exponential backoff. Each batch
+    takes one rate-limiter token per sub-request, since Drive counts them
+    separately against the quota.
+    """
+    results = {}
+    pending = list(requests)
+    attempt = 0
+    while pending:
+        retry = []
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+
+            def callback(request_id, response, exception, chunk=chunk):
+                key, request = chunk[int(request_id)]
+                if isinstance(exception, HttpError) and is_retryable_error(exception) and attempt < max_retries:
+                    retry.append((key, request))
+                else:
+                    results[key] = (response, exception)
+
+            batch = service.new_batch_http_request(callback=callback)
+            for n, (key, request) in enumerate(chunk):
+                batch.add(request, request_id=str(n))
+            execute_with_retry(batch, cost=len(chunk))
+
+        pending = retry
+        if pending:
+            limiter.on_throttle()
+            attempt += 1
+            delay = backoff_delay(attempt)
+            print(f"\nRetrying {len(pending)} throttled batch sub-request(s) in {delay:.1f}s... (Attempt {attempt})")
+            time.sleep(delay)
+    return results
@@ -0,0 +1,1018 @@
+import argparse
+import os
+import posixpath
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from googleapiclient.http import MediaFileUpload
+from googleapiclient.errors import HttpError
+from src.doc_markdown import DOC_FIELDS, doc_file_name, write_markdown
+from src.drive_api import (
+    DEFAULT_DOWNLOAD_CHUNK_SIZE, DOC_EXPORT_MIME_TYPES, FOLDER_MIME_TYPE, GOOGLE_DOC_MIME_TYPE, PARTIAL_SUFFIX,
+    SYNC_FILE_FIELDS, download_file, execute_with_retry, export_file, generate_ids, iter_drive_files, iter_folder_children,
+    needs_reauth
+)
+from src.drive_batch import BATCH_LIMIT, execute_batch
+from src.drive_pull import PullMirror, apply_changes, fetch_changes, list_subtrees, reconcile, start_page_token
+from src.exclude import ExcludeMatcher, load_matcher, parse_patterns
+from src.google_auth import get_google_drive_service, get_service
+from src.local_scan import SCAN_WORKERS, LocalScanner, scan_directory
+from src.metrics import metrics
+from src.remote_index import FolderCache, RemoteIndex
+from src.sync_manifest import STATE_DIR_NAME, StateDB, SyncManifest, file_md5
+from src.sync_plan import SyncPlan
+from src.rate_limit import bandwidth
+from src.transfer import DEFAULT_JOBS, DEFAULT_ORDER, PROGRESS_INTERVAL, BatchStage, TransferPool
+from src.upload_sessions import DEFAULT_UPLOAD_CHUNK_SIZE, UploadSessions, align_chunk_size, run_resumable_upload
+from src.watch import DEFAULT_DEBOUNCE, collect_changes, open_watcher
+
+# --- CONFIGURATION ---
+ROOT_FOLDER_ID = "1falCGVO_jTZTpp8IH619nU71JIT8ZRB3"
+SYNC_FOLDER_NAME = "main_gemini_only_including_gitignore"
+# Paths never uploaded, in .gitignore syntax; a .driveignore file in the synced
+# directory and --exclude add to these, and later rules win
+EXCLUDE_PATTERNS = [
+    # Hidden files, but not hidden directories
+    '.*', '!.*/',
+    '.git/', '.venv/', '__pycache__/', 'notion/', f'{STATE_DIR_NAME}/',
+    'token.json', '.secrets.baseline',
+    # Unity caches and build outputs, all regenerated by the editor. Anchored like
+    # Unity's own .gitignore, so they only apply when a Unity project is the sync root
+    '/[Ll]ibrary/', '/[Tt]emp/', '/[Oo]bj/', '/[Ll]ogs/', '/[Uu]ser[Ss]ettings/', '/[Mm]emoryCaptures/',
+    '/[Bb]uild/', '/[Bb]uilds/',
+]
+
+# --- CORE FUNCTIONS ---
+
+def list_drive_files(folder_id, retry=True):
+    """Prints the files in a Google Drive folder page by page and returns how many were listed."""
+    try:
+        service = get_google_drive_service()
+        if not service:
+            return 0
+
+        print(f"Listing files in folder ID: {folder_id}")
+        count = 0
+        for item in iter_folder_children(service, folder_id):
+            if count == 0:
+                print('Files:')
+            print(f"- {item['name']} ({item['id']})")
+            count += 1
+
+        if not count:
+            print('No files found.')
+        return count
+
+    except HttpError as err:
+        if needs_reauth(err) and retry:
+            print("\n--- ERROR: Could not access Google Drive folder. ---")
+            print("This may be due to stale permissions or an incorrect folder ID.")
+            print("Attempting to fix by re-authenticating...")
+            
+            token_path = 'token.json'
+            if os.path.exists(token_path):
+                os.remove(token_path)
+                print("Removed old authentication token.")
+
+            print("Please follow the browser authentication steps again.")
+            new_service = get_google_drive_service(force_reauth=True)
+            if new_service:
+                return list_drive_files(folder_id, retry=False)
+        else:
+            print(f"An error occurred while listing files: {err}")
+        return 0
+
+def handle_list(args):
+    """Handles listing a Drive folder, the root folder unless one is given."""
+    return list_drive_files(args.folder_id or ROOT_FOLDER_ID)
+
+def find_or_create_folder(service, folder_name, parent_id, cache=None, create=True):
+    """Finds a folder by name in a parent, or creates it if it doesn't exist (returns None instead without `create`)."""
+    if cache:
+        folder_id = cache.get(parent_id, folder_name)
+        if folder_id:
+            print(f"Using cached folder: '{folder_name}' ({folder_id})")
+            return folder_id
+
+    query = f"name='{folder_name}' and '{parent_id}' in parents and mimeType='{FOLDER_MIME_TYPE}' and trashed=false"
+    folder = next(iter_drive_files(service, query, fields="id", page_size=1), None)
+    if folder:
+        folder_id = folder['id']
+        print(f"Found existing folder: '{folder_name}' ({folder_id})")
+    elif not create:
+        print(f"Folder '{folder_name}' does not exist yet.")
+        return None
+    else:
+        print(f"Creating folder: '{folder_name}'...")
+        file_metadata = {
+            'name': folder_name,
+            'mimeType': FOLDER_MIME_TYPE,
+            'parents': [parent_id]
+        }
+        create_request = service.files().create(body=file_metadata, fields='id', supportsAllDrives=True)
+        folder = execute_with_retry(create_request)
+        folder_id = folder.get('id')
+
+    if cache and folder_id:
+        cache.put(parent_id, folder_name, folder_id)
+    return folder_id
+
+def _folder_exists(service, folder_id):
+    """Checks that a folder ID still points at a live (non-trashed) Drive folder."""
+    try:
+        request = service.files().get(fileId=folder_id, fields='id, trashed', supportsAllDrives=True)
+        folder = execute_with_retry(request)
+    except HttpError as err:
+        if err.resp.status == 404:
+            return False
+        raise
+    return not folder.get('trashed')
+
+class SyncContext:
+    """The shared state of one upload run, used by both planning and applying."""
+
+    def __init__(self, pool=None, manifest=None, index=None, sessions=None, chunk_size=DEFAULT_UPLOAD_CHUNK_SIZE, listings=None, matcher=None):
+        # TransferPool running the applied actions; without one they run inline
+        self.pool = pool
+        # SyncManifest for stat/hash change detection; without one, mtimes are compared
+        self.manifest = manifest
+        # RemoteIndex snapshot of the destination; without one, folders are listed
+        self.index = index
+        # UploadSessions keeping resumable uploads alive across runs
+        self.sessions = sessions
+        # Files up to this size go up in one request, larger ones in chunks of it
+        self.chunk_size = align_chunk_size(chunk_size)
+        # LocalScanner listings by relative directory, each used once by the planner
+        self.listings = listings
+        # ExcludeMatcher deciding which local paths are synced
+        self.matcher = matcher or ExcludeMatcher(parse_patterns(EXCLUDE_PATTERNS, 'defaults'))
+        # Remote file IDs already taken as the source of a move, so duplicates claim distinct copies
+        self.moved_ids = set()
+        self.move_lock = threading.Lock()
+
+def _upload_file(service, local_item_path, item_name, parent_drive_id, remote_file_id=None, ctx=None, rel_path=None):
+    """
+    Uploads a single file, updating `remote_file_id` in place when it is given. Returns the Drive item.
+
+    Files no larger than the run's chunk size go up in a single request. Larger
+    ones use a resumable session that is persisted in `ctx.sessions`, so a
+    killed or disconnected run continues from the committed offset next time.
+    """
+    ctx = ctx or SyncContext()
+    stat = os.stat(local_item_path)
+    resumable = stat.st_size > ctx.chunk_size
+    media = MediaFileUpload(local_item_path, chunksize=ctx.chunk_size, resumable=resumable)
+    if remote_file_id:
+        print(f"Updating remote file: '{local_item_path}'")
+        request = service.files().update(fileId=remote_file_id, media_body=media, fields=SYNC_FILE_FIELDS, supportsAllDrives=True)
+        target = f"update:{remote_file_id}"
+    else:
+        print(f"Uploading new file: '{local_item_path}'")
+        file_metadata = {'name': item_name, 'parents': [parent_drive_id]}
+        request = service.files().create(body=file_metadata, media_body=media, fields=SYNC_FILE_FIELDS, supportsAllDrives=True)
+        target = f"create:{parent_drive_id}"
+
+    if not resumable:
+        bandwidth.consume(stat.st_size)
+        return execute_with_retry(request)
+    return run_resumable_upload(request, sessions=ctx.sessions, rel_path=rel_path, stat=stat, target=target)
+
+def _claim_move_source(ctx, local_md5):
+    """
+    Finds an indexed remote file with this content whose local copy is gone, and claims it.
+
+    Only files the manifest records as uploaded from this tree qualify, so a
+    remote file this checkout never synced is never moved.
+    """
+    with ctx.move_lock:
+        for old_rel_path, item in ctx.index.find_by_md5(local_md5):
+            if item['id'] in ctx.moved_ids or item.get('mimeType') == FOLDER_MIME_TYPE:
+                continue
+            entry = ctx.manifest.get(old_rel_path)
+            if entry is None or entry['file_id'] != item['id']:
+                continue
+            if os.path.exists(os.path.join(ctx.manifest.root, *old_rel_path.split('/'))):
+                # Still present locally, so the new file is a copy rather than a move
+                continue
+            ctx.moved_ids.add(item['id'])
+            return old_rel_path, item
+    return None, None
+
+def _move_remote_file(service, ctx, action, parent_drive_id):
+    """
+    Applies a planned move: a metadata-only update that renames and reparents the remote file.
+
+    Returns the updated Drive item, or None when the remote file is gone, in
+    which case the caller uploads instead.
+    """
+    old_rel_path, rel_path = action['from_path'], action['path']
+    kwargs = {}
+    if action.get('from_parent_id') and action['from_parent_id'] != parent_drive_id:
+        kwargs = {'addParents': parent_drive_id, 'removeParents': action['from_parent_id']}
+    print(f"Moving remote file '{old_rel_path}' to '{rel_path}' (content unchanged, no upload needed).")
+    request = service.files().update(
+        fileId=action['file_id'], body={'name': posixpath.basename(rel_path)}, fields=SYNC_FILE_FIELDS,
+        supportsAllDrives=True, **kwargs
+    )
+    try:
+        moved = execute_with_retry(request)
+    except HttpError as err:
+        if err.resp.status != 404:
+            raise
+        print(f"Remote file '{old_rel_path}' no longer exists; uploading instead.")
+        if ctx.index is not None:
+            ctx.index.invalidate(old_rel_path)
+        return None
+
+    if ctx.index is not None:
+        ctx.index.invalidate(old_rel_path)
+    if ctx.manifest is not None:
+        ctx.manifest.forget(old_rel_path)
+    return moved
+
+def _apply_file(service, local_root, action, parent_drive_id, ctx):
+    """
+    Carries out one file action of a SyncPlan and records the outcome in the manifest and index.
+
+    A file whose size or mtime changed since it was planned no longer matches
+    the planned hash, so a planned skip becomes an update and a planned move
+    becomes an upload. A 404 on an upload means the remote index entry was
+    stale and is invalidated.
+    """
+    manifest, index = ctx.manifest, ctx.index
+    rel_path = action['path']
+    local_item_path = os.path.join(local_root, *rel_path.split('/'))
+    item_name = posixpath.basename(rel_path)
+    op = action['op']
+    local_md5 = action.get('md5')
+    stat = os.stat(local_item_path)
+    if (stat.st_size, stat.st_mtime_ns) != (action['size'], action['mtime_ns']):
+        op = {'skip': 'update', 'move': 'create'}.get(op, op)
+        local_md5 = file_md5(local_item_path) if manifest is not None else None
+
+    uploaded = None
+    if op == 'skip':
+        uploaded = {'id': action['file_id']}
+    elif op == 'move':
+        uploaded = _move_remote_file(service, ctx, action, parent_drive_id)
+    if uploaded is None:
+        remote_file_id = action.get('file_id') if op == 'update' else None
+        try:
+            uploaded = _upload_file(service, local_item_path, item_name, parent_drive_id, remote_file_id, ctx=ctx, rel_path=rel_path)
+        except HttpError as err:
+            if index is None or err.resp.status != 404:
+                raise
+            if not remote_file_id:
+                # The parent folder is gone, so the snapshot of this subtree is wrong
+                index.invalidate(posixpath.dirname(rel_path))
+                raise
+            print(f"Remote copy of '{local_item_path}' no longer exists; uploading it again.")
+            index.invalidate(rel_path)
+            uploaded = _upload_file(service, local_item_path, item_name, parent_drive_id, ctx=ctx, rel_path=rel_path)
+    if index is not None and op != 'skip':
+        index.put(rel_path, uploaded)
+    if manifest is not None:
+        manifest.record(manifest.relpath(local_item_path), stat, local_md5, uploaded['id'])
+
+def _create_folders(service, local_path, actions, folder_ids, index=None):
+    """
+    Creates planned folders under IDs reserved in `folder_ids`, with batched requests.
+
+    Every parent must already exist, so the folders of one tree level go in
+    together. A 409 means an earlier attempt of a retried batch already
+    created the folder. Returns the relative paths of the folders that failed.
+    """
+    requests = []
+    for action in actions:
+        rel_path = action['path']
+        print(f"Creating remote directory: '{os.path.join(local_path, *rel_path.split('/'))}'")
+        file_metadata = {
+            'id': folder_ids[rel_path],
+            'name': posixpath.basename(rel_path),
+            'mimeType': FOLDER_MIME_TYPE,
+            'parents': [action.get('parent_id') or folder_ids[posixpath.dirname(rel_path)]]
+        }
+        requests.append((rel_path, service.files().create(body=file_metadata, fields=SYNC_FILE_FIELDS, supportsAllDrives=True)))
+
+    failed = set()
+    for rel_path, (folder, error) in execute_batch(service, requests).items():
+        if error and error.resp.status == 409:
+            folder = {'id': folder_ids[rel_path], 'name': posixpath.basename(rel_path), 'mimeType': FOLDER_MIME_TYPE}
+        elif error:
+            print(f"An error occurred while creating folder '{rel_path}': {error}")
+            failed.add(rel_path)
+            if index is not None and error.resp.status == 404:
+                # The parent folder is gone, so the snapshot of this subtree is wrong
+                index.invalidate(posixpath.dirname(rel_path))
+            continue
+        if index is not None:
+            index.put(rel_path, folder)
+    return failed
+
+def _plan_directory(service, plan, ctx, rel_dir, folder_id, names, candidates):
+    """
+    Adds the folders missing under `rel_dir` to `plan` and collects its files whose stat changed.
+
+    `folder_id` is None for a folder the plan itself creates, which has no
+    remote contents yet. With `ctx.manifest` files are compared by stat,
+    otherwise by mtime; the files that differ go into `candidates` as
+    `rel_path: (stat, remote_item, folder_id)` to be hashed afterwards.
+    """
+    manifest, index = ctx.manifest, ctx.index
+    local_path = os.path.join(plan.local_path, *rel_dir.split('/')) if rel_dir else plan.local_path
+    if folder_id is None:
+        remote_items = {}
+    elif index is not None:
+        remote_items = index.children(rel_dir)
+    else:
+        remote_items = {item['name']: item for item in iter_folder_children(service, folder_id, fields=SYNC_FILE_FIELDS)}
+
+    entries = ctx.listings.pop(rel_dir, None) if ctx.listings is not None else None
+    if entries is None:
+        entries = scan_directory(local_path, rel_dir, ctx.matcher)
+
+    subdirs = []
+    for item_name, is_dir, stat in entries:
+        if names is not None and item_name not in names:
+            continue
+        rel_path = posixpath.join(rel_dir, item_name)
+        remote_item = remote_items.get(item_name)
+
+        if is_dir:
+            if remote_item is None:
+                plan.add('mkdir', rel_path, parent_id=folder_id)
+            subdirs.append((rel_path, remote_item['id'] if remote_item else None))
+            continue
+
+        if manifest:
+            entry = manifest.get(manifest.relpath(os.path.join(local_path, item_name)))
+            if remote_item and manifest.is_unchanged(entry, stat, remote_item['id']):
+                plan.unchanged += 1
+                continue
+        elif remote_item:
+            remote_mtime = datetime.fromisoformat(remote_item['modifiedTime'].replace('Z', '+00:00'))
+            if datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc) <= remote_mtime:
+                plan.unchanged += 1
+                continue
+        candidates[rel_path] = (stat, remote_item, folder_id)
+
+    for rel_path, subdir_id in subdirs:
+        _plan_directory(service, plan, ctx, rel_path, subdir_id, None, candidates)
+
+def _hash_file(path):
+    """Returns the MD5 of a local file, or None when it cannot be read."""
+    try:
+        return file_md5(path)
+    except OSError:
+        return None
+
+def _plan_files(plan, ctx, candidates):
+    """
+    Decides the action of every changed file, hashing them in parallel first.
+
+    A file whose content matches its remote copy is only recorded. One that is
+    new remotely but matches the hash of an indexed file whose local copy is
+    gone was moved or renamed, so that remote file is moved instead.
+    """
+    manifest, index = ctx.manifest, ctx.index
+    hashes = dict.fromkeys(candidates)
+    if manifest is not None and candidates:
+        paths = [os.path.join(plan.local_path, *rel_path.split('/')) for rel_path in candidates]
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+            hashes = dict(zip(candidates, executor.map(_hash_file, paths)))
+
+    for rel_path, (stat, remote_item, parent_id) in candidates.items():
+        local_md5 = hashes[rel_path]
+        if manifest is not None and local_md5 is None:
+            print(f"Could not read '{rel_path}'; skipping it.")
+            continue
+        fields = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'md5': local_md5, 'parent_id': parent_id}
+        if remote_item is not None:
+            op = 'skip' if local_md5 and remote_item.get('md5Checksum') == local_md5 else 'update'
+            plan.add(op, rel_path, file_id=remote_item['id'], **fields)
+            continue
+        # Every empty file has the same hash, so an empty file is never taken for a moved one
+        if local_md5 and index is not None and stat.st_size:
+            old_rel_path, item = _claim_move_source(ctx, local_md5)
+            if item is not None:
+                old_dir = posixpath.dirname(old_rel_path)
+                old_parent = index.lookup(old_dir) if old_dir else {'id': index.root_id}
+                plan.add(
+                    'move', rel_path, file_id=item['id'], from_path=old_rel_path,
+                    from_parent_id=old_parent['id'] if old_parent else None, **fields
+                )
+                continue
+        plan.add('create', rel_path, **fields)
+
+@metrics.timed('sync.plan', 'phase')
+def plan_sync(service, plan, ctx, targets=None):
+    """
+    Fills `plan` with what it takes to sync its local tree to Drive, without writing to Drive.
+
+    Remote folders come from `ctx.index` when there is one and are listed
+    otherwise. Local entries come from the `ctx.listings` scan when it covers a
+    directory, otherwise from a fresh `os.scandir`. `targets` maps relative
+    directories to `(folder_id, names)`, to plan only those entries of them
+    (subdirectories among them in full); by default the whole tree is planned.
+    """
+    candidates = {}
+    for rel_dir, (folder_id, names) in (targets or {'': (plan.root_id, None)}).items():
+        _plan_directory(service, plan, ctx, rel_dir, folder_id, names, candidates)
+    _plan_files(plan, ctx, candidates)
+    return plan
+
+@metrics.timed('sync.apply', 'phase')
+def apply_plan(service, plan, ctx):
+    """
+    Carries out a SyncPlan against the Drive folder `plan.root_id`.
+
+    IDs for all missing folders are reserved up front with generateIds, so a
+    folder's children never wait for its create to come back: each tree level
+    is created with batched requests, and the files in a folder are handed to
+    `ctx.pool` (or run inline without one) as soon as its level exists. Files
+    in folders that already exist start right away. Actions under a folder
+    that could not be created are skipped.
+    """
+    folder_actions = [action for action in plan.actions if action['op'] == 'mkdir']
+    folder_ids = {'': plan.root_id}
+    if folder_actions:
+        print(f"Reserving IDs for {len(folder_actions)} new folder(s)...")
+        for action, folder_id in zip(folder_actions, generate_ids(service, len(folder_actions))):
+            folder_ids[action['path']] = folder_id
+
+    files_by_dir = {}
+    for action in plan.actions:
+        if action['op'] != 'mkdir':
+            files_by_dir.setdefault(posixpath.dirname(action['path']), []).append(action)
+
+    def start_files(rel_dir):
+        for action in files_by_dir.pop(rel_dir, []):
+            task_args = (plan.local_path, action, action.get('parent_id') or folder_ids[rel_dir], ctx)
+            if ctx.pool:
+                size = action['size'] if action['op'] in ('create', 'update') else 0
+                ctx.pool.submit(_apply_file, *task_args, size=size, mtime=action['mtime_ns'] / 1e9)
+            else:
+                _apply_file(service, *task_args)
+
+    for rel_dir in [rel_dir for rel_dir in files_by_dir if rel_dir == '' or rel_dir not in folder_ids]:
+        start_files(rel_dir)
+
+    failed = set()
+    for level in plan.folder_levels():
+        ready = []
+        for action in level:
+            if posixpath.dirname(action['path']) in failed:
+                failed.add(action['path'])
+            else:
+                ready.append(action)
+        if ready:
+            failed.update(_create_folders(service, plan.local_path, ready, folder_ids, index=ctx.index))
+        for action in ready:
+            if action['path'] not in failed:
+                start_files(action['path'])
+
+    skipped = sum(len(actions) for actions in files_by_dir.values())
+    if skipped:
+        print(f"Skipped {skipped} file(s) whose folders could not be created.")
+
+def sync_changes(service, local_path, root_id, paths, ctx):
+    """
+    Pushes only the given changed paths under `local_path`, using `ctx.index` to find their folders.
+
+    Each path is planned from the deepest folder that Drive already has, so a
+    file in a new directory brings the whole new directory with it. Deleted
+    paths are ignored, like in a full sync.
+    """
+    targets = {}
+    for path in paths:
+        rel_path = os.path.relpath(path, local_path).replace(os.sep, '/')
+        if rel_path == '.':
+            # The watcher lost track of events, so fall back to a full sync
+            targets = None
+            break
+        if rel_path.startswith('../'):
+            continue
+        parts = rel_path.split('/')
+        depth = len(parts) - 1
+        while depth > 0 and ctx.index.lookup('/'.join(parts[:depth])) is None:
+            depth -= 1
+        rel_dir = '/'.join(parts[:depth])
+        folder = ctx.index.lookup(rel_dir) if rel_dir else {'id': root_id}
+        if folder and os.path.isdir(os.path.join(local_path, *parts[:depth])):
+            targets.setdefault(rel_dir, (folder['id'], set()))[1].add(parts[depth])
+
+    if targets == {}:
+        return
+    plan = plan_sync(service, SyncPlan(local_path, root_id, chunk_size=ctx.chunk_size), ctx, targets)
+    apply_plan(service, plan, ctx)
+
+def watch_and_sync(service, local_path, root_id, ctx, state, debounce=DEFAULT_DEBOUNCE):
+    """Pushes local changes as they happen until interrupted with Ctrl+C."""
+    # Exclusions were already explained by the initial scan
+    ctx.matcher.explain = False
+    watcher = open_watcher(local_path, is_excluded=ctx.matcher.is_excluded)
+    print(f"\nWatching '{local_path}' for changes. Press Ctrl+C to stop.")
+    try:
+        while True:
+            paths = collect_changes(watcher, debounce=debounce)
+            started = time.monotonic()
+            errors = len(ctx.pool.errors)
+            sync_changes(service, local_path, root_id, paths, ctx)
+            ctx.pool.join()
+            state.commit()
+            failed = len(ctx.pool.errors) - errors
+            status = f", {failed} failed" if failed else ""
+            print(f"Pushed {len(paths)} changed path(s) in {time.monotonic() - started:.1f}s{status}.")
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        watcher.close()
+
+# --- COMMAND HANDLERS ---
+
+def _destination_subfolder(local_path):
+    """Returns the name of the folder a synced directory gets inside the destination, or None to sync into it directly."""
+    if os.path.isdir(local_path) and local_path != '.':
+        return os.path.basename(os.path.normpath(local_path))
+    return None
+
+def _resolve_destination(service, local_path, dest_folder_name, cache=None, create=True):
+    """Finds or creates the Drive folder that `local_path` syncs into and returns its ID."""
+    # Find or create the main destination folder (e.g., shared_working_environment)
+    dest_root_id = find_or_create_folder(service, dest_folder_name, ROOT_FOLDER_ID, cache=cache, create=create)
+    if not dest_root_id:
+        return None
+
+    # If we are syncing a specific directory, create it inside the destination
+    subfolder = _destination_subfolder(local_path)
+    if subfolder:
+        return find_or_create_folder(service, subfolder, dest_root_id, cache=cache, create=create)
+    return dest_root_id
+
+def _report_sync(pool):
+    if pool.errors:
+        print(f"\nSync finished with {len(pool.errors)} failed transfer(s).")
+    else:
+        print("\nSync complete.")
+
+def handle_upload(args, retry=True):
+    """
+    Wrapper function to handle the one-way push sync.
+
+    The sync is planned first, without writing to Drive, and the plan is then
+    applied. With `args.dry_run` the plan is only printed; with
+    `args.save_plan` it is also saved as JSON for 'drive apply'.
+    """
+    try:
+        service = get_google_drive_service()
+        if not service: return
+
+        local_path = args.local_path
+        dest_folder_name = args.dest_folder if args.dest_folder else SYNC_FOLDER_NAME
+        dry_run = getattr(args, 'dry_run', False)
+        
+        print(f"--- Starting Sync{' (dry run)' if dry_run else ''} ---")
+        print(f"Local source: '{local_path}'")
+        print(f"Remote destination folder: '{dest_folder_name}'")
+        
+        with StateDB(local_path) as state:
+            folder_cache = FolderCache(state)
+            final_dest_id = _resolve_destination(service, local_path, dest_folder_name, folder_cache, create=not dry_run)
+            if not final_dest_id and not dry_run:
+                return
+
+            index = None
+            if final_dest_id:
+                index = RemoteIndex(state, final_dest_id)
+                if index.is_built and not args.refresh_index and not _folder_exists(service, final_dest_id):
+                    # The cached destination was deleted on Drive; look it up again from scratch
+                    print("Cached destination folder no longer exists. Rebuilding the remote index...")
+                    index.clear()
+                    folder_cache.clear()
+                    final_dest_id = _resolve_destination(service, local_path, dest_folder_name, folder_cache, create=not dry_run)
+                    index = RemoteIndex(state, final_dest_id) if final_dest_id else None
+                if index is not None and (args.refresh_index or not index.is_built):
+                    index.build(service)
+
+            matcher = load_matcher(
+                local_path, EXCLUDE_PATTERNS, args.exclude, use_gitignore=args.gitignore, explain=args.explain
+            )
+            listings = LocalScanner(state).scan(local_path, matcher)
+            ctx = SyncContext(
+                manifest=SyncManifest(state), index=index, sessions=UploadSessions(state),
+                chunk_size=args.chunk_size or DEFAULT_UPLOAD_CHUNK_SIZE, listings=listings, matcher=matcher
+            )
+            plan = SyncPlan(
+                local_path, final_dest_id, dest_folder=dest_folder_name,
+                subfolder=_destination_subfolder(local_path), chunk_size=ctx.chunk_size
+            )
+            plan_sync(service, plan, ctx)
+            if dry_run:
+                plan.print_actions()
+            print(plan.summary(ctx.chunk_size))
+            if getattr(args, 'save_plan', None):
+                plan.save(args.save_plan)
+                print(f"Saved the plan to '{args.save_plan}'; run 'drive apply {args.save_plan}' to carry it out.")
+            if dry_run:
+                print("\nDry run: nothing was changed on Drive.")
+                return
+
+            with TransferPool(get_service, jobs=args.jobs, order=args.order, progress_interval=PROGRESS_INTERVAL) as pool:
+                ctx.pool = pool
+                apply_plan(service, plan, ctx)
+                if args.watch:
+                    pool.join()
+                    state.commit()
+                    watch_and_sync(service, local_path, final_dest_id, ctx, state, debounce=args.debounce)
+        _report_sync(pool)
+
+    except HttpError as err:
+        if needs_reauth(err) and retry:
+            print("\n--- ERROR: Permission or Not Found issue during sync. ---")
+            print("Attempting to fix by re-authenticating...")
+            
+            token_path = 'token.json'
+            if os.path.exists(token_path):
+                os.remove(token_path)
+                print("Removed old authentication token.")
+
+            print("Please follow the browser authentication steps again.")
+            new_service = get_google_drive_service(force_reauth=True)
+            if new_service:
+                handle_upload(args, retry=False)
+        else:
+            print(f"An error occurred during sync: {err}")
+
+def handle_apply(args):
+    """
+    Applies a sync plan saved by 'drive upload --save-plan'.
+
+    Files that changed since the plan was made are re-checked as they are
+    applied. A plan made before its destination folder existed is refused if
+    the folder has gained contents since, as its creates would duplicate them.
+    """
+    try:
+        plan = SyncPlan.load(args.plan_file)
+    except (OSError, ValueError) as err:
+        print(f"Could not read the sync plan: {err}")
+        return
+
+    service = get_google_drive_service()
+    if not service: return
+
+    print(f"--- Applying sync plan '{args.plan_file}' ---")
+    print(f"Local source: '{plan.local_path}'")
+    chunk_size = args.chunk_size or plan.chunk_size or DEFAULT_UPLOAD_CHUNK_SIZE
+    try:
+        with StateDB(plan.local_path) as state:
+            folder_cache = FolderCache(state)
+            planned_root = plan.root_id
+            if planned_root is None:
+                dest_root_id = find_or_create_folder(service, plan.dest_folder, ROOT_FOLDER_ID, cache=folder_cache)
+                if dest_root_id and plan.subfolder:
+                    dest_root_id = find_or_create_folder(service, plan.subfolder, dest_root_id, cache=folder_cache)
+                if not dest_root_id:
+                    return
+                plan.root_id = dest_root_id
+            elif not _folder_exists(service, planned_root):
+                print("The plan's destination folder no longer exists on Drive. Run the upload again to re-plan.")
+                return
+
+            index = RemoteIndex(state, plan.root_id)
+            if not index.is_built:
+                index.build(service)
+            if planned_root is None and index.children(''):
+                print("The destination folder was filled since the plan was made. Run the upload again to re-plan.")
+                return
+
+            ctx = SyncContext(manifest=SyncManifest(state), index=index, sessions=UploadSessions(state), chunk_size=chunk_size)
+            print(plan.summary(ctx.chunk_size))
+            with TransferPool(get_service, jobs=args.jobs, order=args.order, progress_interval=PROGRESS_INTERVAL) as pool:
+                ctx.pool = pool
+                apply_plan(service, plan, ctx)
+        _report_sync(pool)
+
+    except HttpError as err:
+        print(f"An error occurred while applying the plan: {err}")
+
+def _pull_file(service, item, dest_path, chunk_size, failed):
+    """Streams one mirrored file to disk; its ID goes into `failed` if the download does not complete."""
+    try:
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        print(f"Downloading '{dest_path}'...")
+        size = int(item['size']) if item.get('size') is not None else None
+        if download_file(service, item['id'], dest_path, size=size, md5=item.get('md5Checksum'), chunk_size=chunk_size):
+            return
+    except Exception:
+        failed.add(item['id'])
+        raise
+    failed.add(item['id'])
+
+def handle_pull(args):
+    """
+    Mirrors a Drive folder into a local directory, fetching only what changed since the last pull.
+
+    The first pull lists the whole tree and stores a Changes API cursor in the
+    directory's StateDB; later pulls read the changes since that cursor, apply
+    renames, moves and removals locally, and download only new or changed
+    files. A pull with nothing to do costs a single API call.
+    """
+    service = get_google_drive_service()
+    if not service: return
+
+    local_path = args.local_path
+    root_id = args.folder_id
+    chunk_size = args.chunk_size or DEFAULT_DOWNLOAD_CHUNK_SIZE
+    print(f"--- Pulling folder '{root_id}' into '{local_path}' ---")
+    os.makedirs(local_path, exist_ok=True)
+    try:
+        with StateDB(local_path) as state:
+            mirror = PullMirror(state, root_id)
+            if args.full or mirror.page_token is None:
+                # Taken before listing, so changes made during the listing are picked up next time
+                page_token = start_page_token(service)
+                print("Listing the remote folder tree...")
+                items = list_subtrees(service, [root_id])
+                print(f"Listed {len(items)} remote item(s).")
+            else:
+                changes, page_token = fetch_changes(service, mirror.page_token)
+                if not changes and not mirror.has_pending:
+                    mirror.save(page_token)
+                    print("Already up to date.")
+                    return
+                root_change = next((change for change in changes if change.get('fileId') == root_id), None)
+                if root_change and (root_change.get('removed') or root_change.get('file', {}).get('trashed')):
+                    print("The mirrored folder was removed or trashed on Drive. Nothing was changed locally.")
+                    return
+                print(f"Drive reported {len(changes)} change(s) since the last pull.")
+                items, new_folders = apply_changes(mirror.items, changes, root_id)
+                if new_folders:
+                    for file_id, item in list_subtrees(service, new_folders).items():
+                        items.setdefault(file_id, item)
+
+            downloads, skipped = reconcile(local_path, mirror.items, items, root_id)
+            failed = set()
+            with TransferPool(get_service, jobs=args.jobs, order=args.order, progress_interval=PROGRESS_INTERVAL) as pool:
+                for file_id, rel_path in downloads:
+                    item = items[file_id]
+                    modified = item.get('modifiedTime')
+                    mtime = datetime.fromisoformat(modified.replace('Z', '+00:00')).timestamp() if modified else 0
+                    pool.submit(
+                        _pull_file, item, os.path.join(local_path, *rel_path.split('/')), chunk_size, failed,
+                        size=int(item.get('size') or 0), mtime=mtime
+                    )
+            for file_id, item in items.items():
+                item['pending'] = file_id in failed
+            mirror.save(page_token, items)
+
+        if skipped:
+            print(f"Skipped {skipped} Google Workspace file(s), which have no binary content to download.")
+        status = f", {len(failed)} failed and will be retried next time" if failed else ""
+        print(f"\nPulled {len(downloads) - len(failed)} file(s){status}.")
+
+    except HttpError as err:
+        print(f"An error occurred while pulling the folder: {err}")
+
+def handle_download(args, service=None):
+    """Handles downloading a file from Google Drive, streaming it straight to disk."""
+    if not service:
+        service = get_google_drive_service()
+        if not service: return
+
+    file_id = args.file_id if hasattr(args, 'file_id') else args
+    chunk_size = getattr(args, 'chunk_size', None) or DEFAULT_DOWNLOAD_CHUNK_SIZE
+    try:
+        request = service.files().get(fileId=file_id, fields='name, size, md5Checksum', supportsAllDrives=True)
+        file_metadata = execute_with_retry(request)
+        file_name = getattr(args, 'local_name', None) or file_metadata['name']
+        print(f"Starting download for '{file_name}'...")
+
+        size = int(file_metadata['size']) if 'size' in file_metadata else None
+        if not download_file(service, file_id, file_name, size=size, md5=file_metadata.get('md5Checksum'), chunk_size=chunk_size):
+            return False
+        print(f"\nSuccessfully downloaded '{file_name}'.")
+        return True
+
+    except TimeoutError:
+        print("\nDownload failed after multiple timeouts. Run it again to resume.")
+        return False
+    except HttpError as err:
+        print(f"An error occurred while downloading the file: {err}")
+        return False
+
+def _export_google_doc(service, document_id, base_name=None):
+    """Saves a Google Doc through Drive's Markdown export, falling back to plain text."""
+    metadata = execute_with_retry(service.files().get(fileId=document_id, fields='name', supportsAllDrives=True))
+    base_name = base_name or metadata['name'].replace(' ', '_')
+    for extension, mime_type in DOC_EXPORT_MIME_TYPES.items():
+        file_name = f"{base_name}.{extension}"
+        print(f"Exporting '{metadata['name']}' as {mime_type} ('{file_name}')...")
+        try:
+            export_file(service, document_id, file_name, mime_type)
+            return file_name
+        except HttpError as err:
+            # 400 means Drive cannot export this document in that format
+            if err.resp.status != 400 or extension == 'txt':
+                raise
+            print(f"Export as {mime_type} is not available, trying the next format.")
+
+def download_google_doc_as_md(args, docs_service=None, drive_service=None):
+    """
+    Downloads a Google Doc and converts it to a Markdown file, reusing the given services.
+
+    Only the fields the converter renders are requested, and the Markdown is
+    streamed to a partial file as it is generated. With `args.via_export`,
+    Drive's own export is saved instead, which is faster but keeps less styling.
+    """
+    document_id = args.file_id
+    try:
+        if getattr(args, 'via_export', False):
+            drive_service = drive_service or get_service("drive", "v3")
+            if not drive_service: return
+            local_name = getattr(args, 'local_name', None)
+            file_name = _export_google_doc(drive_service, document_id, local_name and os.path.splitext(local_name)[0])
+            print(f"Successfully exported to '{file_name}'.")
+            return True
+
+        if not docs_service:
+            docs_service = get_service("docs", "v1")
+            if not docs_service: return
+
+        print(f"Fetching Google Doc: {document_id}")
+        document = execute_with_retry(docs_service.documents().get(documentId=document_id, fields=DOC_FIELDS))
+
+        doc_title = document.get('title', 'Untitled')
+        file_name = getattr(args, 'local_name', None) or doc_file_name(doc_title)
+        print(f"Converting '{doc_title}' to Markdown ('{file_name}')...")
+
+        part_path = file_name + PARTIAL_SUFFIX
+        with open(part_path, 'w', encoding='utf-8') as f, metrics.span('docs.to_markdown', 'cpu'):
+            write_markdown(document, f)
+        os.replace(part_path, file_name)
+        print(f"Successfully converted and saved to '{file_name}'.")
+        return True
+
+    except HttpError as err:
+        print(f"An error occurred while converting the Google Doc: {err}")
+        return False
+
+def _read_file_ids(args):
+    """Collects file IDs from the command line and from an optional file with one ID per line."""
+    file_ids = list(args.file_ids)
+    if args.from_file:
+        with open(args.from_file, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    file_ids.append(line)
+    return file_ids
+
+def move_files(service, file_ids, folder_id):
+    """Moves many files into a folder with batched requests and returns the IDs that were moved."""
+    get_requests = [(file_id, service.files().get(fileId=file_id, fields='parents', supportsAllDrives=True)) for file_id in file_ids]
+    update_requests = []
+    for file_id, (file, error) in execute_batch(service, get_requests).items():
+        if error:
+            print(f"An error occurred while moving file ID '{file_id}': {error}")
+            continue
+        previous_parents = ",".join(file.get('parents', []))
+        update_requests.append((file_id, service.files().update(
+            fileId=file_id,
+            addParents=folder_id,
+            removeParents=previous_parents,
+            fields='id, parents',
+            supportsAllDrives=True
+        )))
+
+    moved = []
+    for file_id, (_, error) in execute_batch(service, update_requests).items():
+        if error:
+            print(f"An error occurred while moving file ID '{file_id}': {error}")
+        else:
+            print(f"Successfully moved file ID '{file_id}' to folder ID '{folder_id}'.")
+            moved.append(file_id)
+    return moved
+
+def delete_files(service, file_ids):
+    """Deletes many files with batched requests and returns the IDs that were deleted."""
+    requests = [(file_id, service.files().delete(fileId=file_id, supportsAllDrives=True)) for file_id in file_ids]
+    deleted = []
+    for file_id, (_, error) in execute_batch(service, requests).items():
+        if error:
+            print(f"An error occurred while deleting file ID '{file_id}': {error}")
+        else:
+            print(f"Successfully deleted file ID '{file_id}'.")
+            deleted.append(file_id)
+    return deleted
+
+def handle_move(args):
+    """Handles moving one or more files into a folder in Google Drive."""
+    service = get_google_drive_service()
+    if not service: return
+
+    file_ids = _read_file_ids(args)
+    if not file_ids:
+        print("No file IDs given to move.")
+        return
+    try:
+        moved = move_files(service, file_ids, args.folder_id)
+        print(f"Moved {len(moved)} of {len(file_ids)} file(s).")
+    except HttpError as err:
+        print(f"An error occurred while moving the files: {err}")
+
+def handle_delete(args):
+    """Handles deleting one or more files from Google Drive."""
+    service = get_google_drive_service()
+    if not service: return
+
+    file_ids = _read_file_ids(args)
+    if not file_ids:
+        print("No file IDs given to delete.")
+        return
+    try:
+        deleted = delete_files(service, file_ids)
+        print(f"Deleted {len(deleted)} of {len(file_ids)} file(s).")
+        return deleted
+    except HttpError as err:
+        print(f"An error occurred while deleting the files: {err}")
+
+def _delete_processed(service, file_ids):
+    """Deletes a batch of remote files that were downloaded successfully."""
+    print("-" * 20)
+    print(f"Deleting {len(file_ids)} remote file(s) after successful download.")
+    try:
+        delete_files(service, file_ids)
+    except HttpError as err:
+        print(f"An error occurred while deleting the processed files: {err}")
+
+def _unique_local_name(file, claimed):
+    """
+    Returns the local file name of an inbox file, unique among the downloads of this run.
+
+    Drive allows several files with the same name in a folder. Downloads run
+    in parallel, so two of them writing the same file (or its partial file)
+    would mix their contents; a name that is already taken gets the file ID.
+    """
+    name = doc_file_name(file['name']) if file.get('mimeType') == GOOGLE_DOC_MIME_TYPE else file['name']
+    if name in claimed:
+        stem, extension = os.path.splitext(name)
+        name = f"{stem}_{file['id']}{extension}"
+    claimed.add(name)
+    return name
+
+def _process_file(clients, file, deletes, via_export=False, local_name=None):
+    """Downloads one inbox file and queues it for deletion only if the download succeeded."""
+    drive_service, docs_service = clients
+    # Mimic argparse object for the download functions
+    download_args = argparse.Namespace(file_id=file['id'], via_export=via_export, local_name=local_name)
+
+    print("-" * 20)
+    if file.get('mimeType') == GOOGLE_DOC_MIME_TYPE:
+        download_successful = download_google_doc_as_md(download_args, docs_service=docs_service, drive_service=drive_service)
+    else:
+        download_successful = handle_download(download_args, service=drive_service)
+
+    if download_successful:
+        deletes.put(file['id'])
+
+def handle_process(args):
+    """
+    Downloads all files from a folder and then deletes them.
+
+    The listing feeds a pool of download workers, each with its own Drive and
+    Docs services. Files that downloaded successfully flow into a delete stage
+    that removes them in batches; nothing else is ever deleted.
+    """
+    service = get_google_drive_service()
+    if not service: return
+
+    folder_id = args.folder_id
+    print(f"--- Starting to process folder '{folder_id}' ---")
+
+    def build_clients():
+        return get_service("drive", "v3"), get_service("docs", "v1")
+
+    count = 0
+    claimed = set()
+    # Deletes wait until the listing is complete, so they cannot shift later pages
+    with BatchStage(get_service, _delete_processed, BATCH_LIMIT, paused=True) as deletes:
+        order = getattr(args, 'order', DEFAULT_ORDER)
+        with TransferPool(build_clients, jobs=getattr(args, 'jobs', DEFAULT_JOBS), order=order, progress_interval=PROGRESS_INTERVAL) as pool:
+            try:
+                for file in iter_folder_children(service, folder_id, fields="id, name, mimeType, size, modifiedTime"):
+                    modified = file.get('modifiedTime')
+                    mtime = datetime.fromisoformat(modified.replace('Z', '+00:00')).timestamp() if modified else 0
+                    pool.submit(
+                        _process_file, file, deletes, getattr(args, 'via_export', False), _unique_local_name(file, claimed),
+                        size=int(file.get('size', 0)), mtime=mtime
+                    )
+                    count += 1
+            except HttpError as err:
+                print(f"An error occurred while listing files: {err}")
+            finally:
+                deletes.resume()
+
+    if not count:
+        print("No files to process.")
+    print("\n--- Finished processing folder. ---")
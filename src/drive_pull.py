@@ -0,0 +1,335 @@
+import os
+import time
+
+from src.drive_api import FOLDER_MIME_TYPE, execute_with_retry, iter_drive_files
+from src.metrics import metrics
+from src.remote_index import PARENTS_PER_QUERY
+from src.sync_manifest import STATE_DIR_NAME, file_md5
+
+# --- CONFIGURATION ---
+
+# Per-file fields a mirror keeps track of
+PULL_FIELDS = "id, name, mimeType, parents, trashed, md5Checksum, size, modifiedTime"
+# Partial-response mask for changes().list
+CHANGE_FIELDS = f"nextPageToken, newStartPageToken, changes(changeType, fileId, removed, file({PULL_FIELDS}))"
+# Largest page size accepted by changes().list
+CHANGES_PAGE_SIZE = 1000
+# Google Workspace files (Docs, Sheets, ...) have no binary content to download
+WORKSPACE_MIME_PREFIX = 'application/vnd.google-apps.'
+
+# --- FUNCTIONS ---
+
+def _mirror_item(file, parent_id, pending=False):
+    """Keeps the fields a mirror stores for a Drive item, with the one parent that is inside the mirror."""
+    return {
+        'id': file['id'], 'name': file['name'], 'mimeType': file.get('mimeType'), 'parent': parent_id,
+        'md5Checksum': file.get('md5Checksum'), 'size': file.get('size'), 'modifiedTime': file.get('modifiedTime'),
+        'pending': pending,
+    }
+
+def is_folder(item):
+    return item['mimeType'] == FOLDER_MIME_TYPE
+
+def is_downloadable(item):
+    """Checks whether an item has binary content that `get_media` can fetch."""
+    return not (item['mimeType'] or '').startswith(WORKSPACE_MIME_PREFIX)
+
+def _local_name(name):
+    """Makes a Drive name usable as a local file name: Drive allows '/' and names like '..'."""
+    name = name.replace('/', '_').replace(os.sep, '_')
+    return '_' if name in ('', '.', '..') else name
+
+def item_path(items, file_id, root_id):
+    """Returns the local path of an item relative to the mirror root, or None if it is not under the root."""
+    parts = []
+    seen = set()
+    while file_id != root_id:
+        item = items.get(file_id)
+        if item is None or file_id in seen:
+            return None
+        seen.add(file_id)
+        parts.append(item.get('local_name') or _local_name(item['name']))
+        file_id = item['parent']
+    if not parts or parts[-1] == STATE_DIR_NAME:
+        # The mirror's own state directory is never overwritten
+        return None
+    return '/'.join(reversed(parts))
+
+def assign_local_names(items, previous=None):
+    """
+    Gives every item the file name it has in the mirror, unique among its siblings.
+
+    Drive allows several items with the same name in one folder. Locally the
+    first keeps the name and the others get their file ID appended. An item
+    whose name and parent did not change since `previous` keeps its old local
+    name, so a duplicate does not swap names with its sibling between pulls.
+    """
+    previous = previous or {}
+    taken = {}
+    unnamed = []
+    for file_id, item in items.items():
+        old = previous.get(file_id)
+        if old and old.get('local_name') and old['name'] == item['name'] and old['parent'] == item['parent']:
+            item['local_name'] = old['local_name']
+            taken.setdefault(item['parent'], set()).add(item['local_name'])
+        else:
+            unnamed.append(item)
+    for item in sorted(unnamed, key=lambda item: item['id']):
+        siblings = taken.setdefault(item['parent'], set())
+        name = _local_name(item['name'])
+        if name in siblings:
+            stem, extension = os.path.splitext(name)
+            name = f"{stem}_{item['id']}{extension}"
+        item['local_name'] = name
+        siblings.add(name)
+    return items
+
+@metrics.timed('pull.list_tree', 'phase')
+def list_subtrees(service, folder_ids):
+    """
+    Lists everything below the given folders and returns `{file_id: item}`.
+
+    The listing is breadth-first and asks about many folders per query, so a
+    tree costs about one request per level rather than one per folder.
+    """
+    items = {}
+    level = list(folder_ids)
+    while level:
+        next_level = []
+        for i in range(0, len(level), PARENTS_PER_QUERY):
+            batch = set(level[i:i + PARENTS_PER_QUERY])
+            parents = " or ".join(f"'{folder_id}' in parents" for folder_id in batch)
+            for file in iter_drive_files(service, f"({parents}) and trashed=false", fields=PULL_FIELDS):
+                parent_id = next((p for p in file.get('parents', []) if p in batch), None)
+                if parent_id is None or file['id'] in items:
+                    continue
+                items[file['id']] = _mirror_item(file, parent_id)
+                if is_folder(items[file['id']]):
+                    next_level.append(file['id'])
+        level = next_level
+    return items
+
+def start_page_token(service):
+    """Returns the Changes API cursor for "now"."""
+    request = service.changes().getStartPageToken(supportsAllDrives=True)
+    return execute_with_retry(request)['startPageToken']
+
+def _is_file_change(change):
+    """Checks whether a Changes API entry is about a file; changes to shared drives themselves carry no fileId."""
+    return change.get('changeType', 'file') == 'file' and 'fileId' in change
+
+def fetch_changes(service, page_token):
+    """Returns every file change since `page_token` and the cursor to use next time; shared drive changes are left out."""
+    changes = []
+    while True:
+        request = service.changes().list(
+            pageToken=page_token,
+            pageSize=CHANGES_PAGE_SIZE,
+            spaces='drive',
+            includeRemoved=True,
+            fields=CHANGE_FIELDS,
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True
+        )
+        results = execute_with_retry(request)
+        changes.extend(change for change in results.get('changes', []) if _is_file_change(change))
+        if 'newStartPageToken' in results:
+            return changes, results['newStartPageToken']
+        page_token = results['nextPageToken']
+
+def apply_changes(items, changes, root_id):
+    """
+    Applies Changes API entries to a copy of a mirror's items.
+
+    Returns the new items and the IDs of the folders that entered the mirror,
+    whose contents were not necessarily reported as changes (a folder moved
+    in from elsewhere brings its whole subtree) and still have to be listed.
+    Items that left the mirror, directly or with a folder, are dropped.
+    """
+    latest = {}
+    for change in filter(_is_file_change, changes):
+        latest[change['fileId']] = change
+    new = {file_id: item for file_id, item in items.items() if file_id not in latest}
+
+    # An item belongs to the mirror if one of its parents does; parents may be among the changes too
+    candidates = {
+        file_id: change['file'] for file_id, change in latest.items()
+        if not change.get('removed') and change.get('file') and not change['file'].get('trashed')
+    }
+    added = True
+    while added:
+        added = False
+        for file_id, file in list(candidates.items()):
+            parent_id = next(
+                (p for p in file.get('parents', []) if p == root_id or (p in new and is_folder(new[p]))), None
+            )
+            if parent_id is not None:
+                new[file_id] = _mirror_item(file, parent_id)
+                del candidates[file_id]
+                added = True
+
+    new = {file_id: item for file_id, item in new.items() if item_path(new, file_id, root_id) is not None}
+    new_folders = [file_id for file_id, item in new.items() if is_folder(item) and file_id not in items]
+    return new, new_folders
+
+def _same_content(old, new):
+    if old.get('pending'):
+        return False
+    if old.get('md5Checksum') or new.get('md5Checksum'):
+        return old.get('md5Checksum') == new.get('md5Checksum')
+    return old.get('modifiedTime') == new.get('modifiedTime')
+
+def _matches_local(path, item):
+    """Checks whether a local file already holds an item's content, by size and then hash."""
+    try:
+        if item.get('size') is None or os.path.getsize(path) != int(item['size']):
+            return False
+        return item.get('md5Checksum') is not None and file_md5(path) == item['md5Checksum']
+    except OSError:
+        return False
+
+@metrics.timed('pull.reconcile', 'disk')
+def reconcile(local_root, old, new, root_id):
+    """
+    Brings the local mirror's folders and file names in line with `new` and returns the files to download.
+
+    Items of `new` first get their local names from `assign_local_names`.
+    Folders that were renamed or moved on Drive are renamed locally, and
+    files whose content did not change are moved rather than downloaded
+    again. Files that left the mirror are deleted unless their size shows
+    they were edited locally; folders that left it are removed once empty.
+    Returns `(downloads, skipped)`: `(file_id, rel_path)` pairs to download,
+    and how many Google Workspace files were left out for having no binary
+    content.
+    """
+    assign_local_names(new, old)
+
+    def local(rel_path):
+        return os.path.join(local_root, *rel_path.split('/'))
+
+    # Where each item is on disk right now; updated as folders are renamed
+    current = dict(old)
+
+    removed = [file_id for file_id in old if file_id not in new]
+    for file_id in removed:
+        item = old[file_id]
+        rel_path = item_path(current, file_id, root_id)
+        if is_folder(item) or not is_downloadable(item) or rel_path is None:
+            continue
+        path = local(rel_path)
+        if not os.path.isfile(path):
+            continue
+        if item.get('size') is not None and os.path.getsize(path) != int(item['size']):
+            print(f"Keeping '{rel_path}': it was removed on Drive but changed locally.")
+            continue
+        print(f"Removing '{rel_path}' (removed on Drive).")
+        os.remove(path)
+
+    folders = [file_id for file_id, item in new.items() if is_folder(item)]
+    for file_id in sorted(folders, key=lambda file_id: item_path(new, file_id, root_id).count('/')):
+        target = item_path(new, file_id, root_id)
+        source = item_path(current, file_id, root_id) if file_id in current else None
+        if source is not None and source != target and os.path.isdir(local(source)) and not os.path.exists(local(target)):
+            print(f"Renaming folder '{source}' to '{target}'.")
+            os.makedirs(os.path.dirname(local(target)), exist_ok=True)
+            os.rename(local(source), local(target))
+        os.makedirs(local(target), exist_ok=True)
+        current[file_id] = new[file_id]
+
+    downloads = []
+    skipped = 0
+    for file_id, item in new.items():
+        if is_folder(item):
+            continue
+        if not is_downloadable(item):
+            skipped += 1
+            continue
+        target = item_path(new, file_id, root_id)
+        previous = old.get(file_id)
+        if previous is None:
+            if not _matches_local(local(target), item):
+                downloads.append((file_id, target))
+            continue
+
+        source = item_path(current, file_id, root_id)
+        same = _same_content(previous, item)
+        if same and source == target:
+            continue
+        if source is not None and source != target and os.path.isfile(local(source)):
+            if same:
+                print(f"Moving '{source}' to '{target}'.")
+                os.makedirs(os.path.dirname(local(target)), exist_ok=True)
+                os.replace(local(source), local(target))
+                continue
+            os.remove(local(source))
+        downloads.append((file_id, target))
+
+    # Found after the renames, which may have moved them; deepest first, so removed subfolders go before their parents
+    removed_dirs = [item_path(current, file_id, root_id) for file_id in removed if is_folder(old[file_id])]
+    for rel_path in sorted(filter(None, removed_dirs), key=lambda rel_path: -rel_path.count('/')):
+        if not os.path.isdir(local(rel_path)):
+            continue
+        try:
+            os.rmdir(local(rel_path))
+            print(f"Removed folder '{rel_path}' (removed on Drive).")
+        except OSError:
+            print(f"Keeping folder '{rel_path}': it still holds local files.")
+    return downloads, skipped
+
+# --- CLASSES ---
+
+class PullMirror:
+    """
+    What a local mirror of a Drive folder last pulled, kept in the mirror's StateDB.
+
+    Items are stored by file ID with the parent they have inside the mirror,
+    so renaming or moving a folder changes one row; local paths are found by
+    walking up the parents. Next to the items is the Changes API page token of
+    the last pull, so the next pull only asks Drive what changed since. Items
+    whose download failed are marked pending and fetched again next time.
+    """
+
+    def __init__(self, state, root_id):
+        self.root_id = root_id
+        self._state = state
+        state.write(
+            "CREATE TABLE IF NOT EXISTS pull_items ("
+            "root_id TEXT, file_id TEXT, parent_id TEXT, name TEXT, local_name TEXT, mime_type TEXT, md5 TEXT, "
+            "size INTEGER, modified_time TEXT, pending INTEGER, PRIMARY KEY (root_id, file_id))"
+        )
+        state.write("CREATE TABLE IF NOT EXISTS pull_roots (root_id TEXT PRIMARY KEY, page_token TEXT, pulled_at REAL)")
+
+        rows = state.query("SELECT page_token FROM pull_roots WHERE root_id=?", (root_id,))
+        self.page_token = rows[0][0] if rows else None
+        self.items = {}
+        for file_id, parent_id, name, local_name, mime_type, md5, size, modified_time, pending in state.query(
+            "SELECT file_id, parent_id, name, local_name, mime_type, md5, size, modified_time, pending "
+            "FROM pull_items WHERE root_id=?",
+            (root_id,)
+        ):
+            self.items[file_id] = {
+                'id': file_id, 'name': name, 'local_name': local_name, 'mimeType': mime_type, 'parent': parent_id,
+                'md5Checksum': md5, 'size': size, 'modifiedTime': modified_time, 'pending': bool(pending),
+            }
+
+    @property
+    def has_pending(self):
+        return any(item['pending'] for item in self.items.values())
+
+    def save(self, page_token, items=None):
+        """Stores the cursor of this pull and, when they changed, the mirrored items."""
+        if items is not None:
+            self._state.write("DELETE FROM pull_items WHERE root_id=?", (self.root_id,))
+            self._state.write(
+                "INSERT INTO pull_items VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (self.root_id, file_id, item['parent'], item['name'], item.get('local_name'), item['mimeType'],
+                     item['md5Checksum'], item['size'], item['modifiedTime'], int(item['pending']))
+                    for file_id, item in items.items()
+                ],
+                many=True
+            )
+            self.items = items
+        self._state.write("INSERT OR REPLACE INTO pull_roots VALUES (?, ?, ?)", (self.root_id, page_token, time.time()))
+        self._state.commit()
+        self.page_token = page_token
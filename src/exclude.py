@@ -0,0 +1,163 @@
+import hashlib
+import itertools
+import os
+import re
+
+# --- CONFIGURATION ---
+
+# Project-level exclude file, read from the root of the synced directory
+DRIVEIGNORE_NAME = '.driveignore'
+GITIGNORE_NAME = '.gitignore'
+
+# --- FUNCTIONS ---
+
+def _translate(pattern):
+    """Translates one gitignore glob (without its '!' and trailing '/') into a regex source."""
+    # A slash anywhere but at the end anchors the pattern to the root; otherwise it matches at any depth
+    anchored = '/' in pattern
+    if pattern.startswith('/'):
+        pattern = pattern[1:]
+
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/'):
+            if pattern.startswith('/', i + 2):
+                # "**/" matches any number of leading directories, including none
+                out.append('(?:.*/)?')
+                i += 3
+                continue
+            if i + 2 == n:
+                # A trailing "/**" matches everything inside
+                out.append('.*')
+                i += 2
+                continue
+        if c == '*':
+            out.append('[^/]*')
+        elif c == '?':
+            out.append('[^/]')
+        elif c == '[' and pattern.find(']', i + 2) != -1:
+            end = pattern.find(']', i + 2)
+            body = pattern[i + 1:end].replace('\\', '\\\\')
+            if body[0] in '!^':
+                body = '^' + body[1:]
+            out.append(f'[{body}]')
+            i = end
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+
+    body = ''.join(out)
+    return body if anchored else f'(?:.*/)?{body}'
+
+def parse_patterns(lines, source):
+    """Parses lines in .gitignore syntax into a list of ExcludeRules, labelled with `source` and the line number."""
+    rules = []
+    for number, line in enumerate(lines, 1):
+        line = line.rstrip('\n')
+        stripped = line.rstrip(' ')
+        # A backslash keeps one trailing space
+        if stripped.endswith('\\') and len(stripped) < len(line):
+            stripped += ' '
+        text = stripped
+        if not text or text.startswith('#'):
+            continue
+
+        negated = text.startswith('!')
+        if negated or text.startswith('\\!') or text.startswith('\\#'):
+            text = text[1:]
+        dir_only = text.endswith('/')
+        text = text.rstrip('/')
+        if text:
+            rules.append(ExcludeRule(stripped, f"{source}:{number}", negated, dir_only, _translate(text)))
+    return rules
+
+def _compile(rules):
+    """Compiles rules into one alternation regex, or returns None if there are none."""
+    if not rules:
+        return None
+    return re.compile('(?:' + '|'.join(f'(?:{rule.regex})' for rule in rules) + r')\Z', re.DOTALL)
+
+def load_matcher(root, default_patterns=(), extra_patterns=(), use_gitignore=False, explain=False):
+    """
+    Builds the ExcludeMatcher for a sync root.
+
+    Rules come, in increasing precedence, from `default_patterns`, the root's
+    .gitignore (only with `use_gitignore`), its .driveignore, and
+    `extra_patterns` given on the command line.
+    """
+    rules = parse_patterns(default_patterns, 'defaults')
+    for name in ([GITIGNORE_NAME] if use_gitignore else []) + [DRIVEIGNORE_NAME]:
+        path = os.path.join(root, name)
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8') as f:
+                rules.extend(parse_patterns(f, name))
+    rules.extend(parse_patterns(extra_patterns or (), '--exclude'))
+    return ExcludeMatcher(rules, explain=explain)
+
+# --- CLASSES ---
+
+class ExcludeRule:
+    """One parsed exclude pattern and where it came from."""
+
+    def __init__(self, pattern, source, negated, dir_only, regex):
+        self.pattern = pattern
+        self.source = source
+        # A "!" rule re-includes what earlier rules excluded
+        self.negated = negated
+        # A trailing "/" makes the rule match directories only
+        self.dir_only = dir_only
+        self.regex = regex
+        self.compiled = re.compile(regex + r'\Z', re.DOTALL)
+
+    def __repr__(self):
+        return f"'{self.pattern}' ({self.source})"
+
+class ExcludeMatcher:
+    """
+    Decides whether a path relative to the sync root is excluded, with .gitignore semantics.
+
+    As in git, the last matching rule wins, and paths are matched one at a
+    time: callers prune an excluded directory instead of asking about its
+    contents. Consecutive rules of the same kind are compiled into a single
+    regex, so a check costs one regex match per run of rules rather than one
+    per rule. With `explain`, every exclusion is printed with its rule.
+    """
+
+    def __init__(self, rules, explain=False):
+        self.rules = rules
+        self.explain = explain
+        self._groups = []
+        for negated, run in itertools.groupby(rules, key=lambda rule: rule.negated):
+            run = list(run)
+            self._groups.append((negated, _compile(run), _compile([rule for rule in run if not rule.dir_only])))
+        # Checked from the last run backwards, since the last match wins
+        self._groups.reverse()
+        key = '\n'.join(f"{rule.negated}:{rule.dir_only}:{rule.regex}" for rule in rules)
+        self.fingerprint = hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    def match(self, rel_path, is_dir):
+        """Returns the rule that decides a path, or None when no rule matches."""
+        for rule in reversed(self.rules):
+            if (is_dir or not rule.dir_only) and rule.compiled.match(rel_path):
+                return rule
+        return None
+
+    def is_excluded(self, rel_path, is_dir):
+        """Checks whether the file or directory at `rel_path` ('/'-separated) is excluded."""
+        if self.explain:
+            rule = self.match(rel_path, is_dir)
+            excluded = rule is not None and not rule.negated
+            if excluded:
+                print(f"Excluded '{rel_path}{'/' if is_dir else ''}' by {rule}")
+            return excluded
+
+        for negated, dir_regex, file_regex in self._groups:
+            regex = dir_regex if is_dir else file_regex
+            if regex is not None and regex.match(rel_path):
+                return not negated
+        return False
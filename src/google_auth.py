@@ -1,9 +1,14 @@
+import json
 import os
+import threading
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
 from googleapiclient.errors import HttpError
+from googleapiclient.http import build_http
 
 # --- CONFIGURATION ---
 
@@ -17,6 +22,15 @@ SCOPES = [
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TOKEN_PATH = os.path.join(BASE_DIR, '..', 'token.json')
 CLIENT_SECRET_PATH = os.path.join(BASE_DIR, '..', 'client_secret.json')
+# Discovery documents fetched by client libraries that do not bundle them
+DISCOVERY_CACHE_DIR = os.path.join(BASE_DIR, '..', '.reality_merge', 'discovery')
+
+# Process-wide client session: credentials and parsed discovery documents are
+# shared, while services and their pooled HTTP connections are per thread
+_session_lock = threading.Lock()
+_session_credentials = None
+_discovery_docs = {}
+_thread_clients = threading.local()
 
 # --- FUNCTIONS ---
 
@@ -48,18 +62,79 @@ def get_credentials(force_reauth=False):
     
     return creds
 
-def get_google_drive_service(force_reauth=False):
-    """Builds and returns a Google Drive API service object."""
-    creds = get_credentials(force_reauth=force_reauth)
+def get_session_credentials(force_reauth=False):
+    """Returns the credentials shared by the whole process, loading them on first use."""
+    global _session_credentials
+    with _session_lock:
+        if force_reauth:
+            reset_session()
+        if _session_credentials is None:
+            _session_credentials = get_credentials(force_reauth=force_reauth)
+        return _session_credentials
+
+def reset_session():
+    """Forgets the session's credentials so every thread rebuilds its services."""
+    global _session_credentials
+    _session_credentials = None
+
+def _discovery_document(api, version, http):
+    """Returns the parsed discovery document of an API, reading it at most once per process."""
+    key = f"{api}.{version}"
+    with _session_lock:
+        doc = _discovery_docs.get(key)
+    if doc:
+        return doc
+
+    content = discovery_cache.get_static_doc(api, version)
+    cache_path = os.path.join(DISCOVERY_CACHE_DIR, f"{key}.json")
+    if not content and os.path.exists(cache_path):
+        with open(cache_path, encoding='utf-8') as f:
+            content = f.read()
+    if content:
+        doc = json.loads(content)
+    else:
+        # Older client libraries do not bundle the documents; fetch it once and keep it on disk
+        doc = build(api, version, http=http, cache_discovery=False)._rootDesc
+        os.makedirs(DISCOVERY_CACHE_DIR, exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump(doc, f)
+
+    with _session_lock:
+        _discovery_docs[key] = doc
+    return doc
+
+def get_service(api="drive", version="v3", force_reauth=False):
+    """
+    Returns this thread's service object for a Google API, or None without credentials.
+
+    Each thread builds a service once and then reuses it, together with one
+    HTTP connection pool shared by all of that thread's services. httplib2 is
+    not thread-safe, so threads never share them.
+    """
+    creds = get_session_credentials(force_reauth=force_reauth)
     if not creds:
         return None
+
+    clients = _thread_clients.__dict__
+    if clients.get('credentials') is not creds:
+        clients.clear()
+        clients['credentials'] = creds
+        clients['http'] = AuthorizedHttp(creds, http=build_http())
+    key = f"{api}.{version}"
+    if key not in clients:
+        clients[key] = build_from_document(_discovery_document(api, version, clients['http']), http=clients['http'])
+    return clients[key]
+
+def get_google_drive_service(force_reauth=False):
+    """Returns the session's Google Drive API service object for this thread."""
     try:
-        service = build("drive", "v3", credentials=creds)
-        print("Successfully authenticated with Google Drive API.")
-        return service
+        service = get_service("drive", "v3", force_reauth=force_reauth)
     except HttpError as err:
         print(f"An error occurred building the Drive service: {err}")
         return None
+    if service:
+        print("Successfully authenticated with Google Drive API.")
+    return service
 
 def main():
     """Main function to trigger the authentication flow."""
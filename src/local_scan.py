@@ -0,0 +1,135 @@
+import os
+import posixpath
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.metrics import metrics
+
+# --- CONFIGURATION ---
+
+# Threads listing and stat-ing directories concurrently; the syscalls release the GIL
+SCAN_WORKERS = 8
+# Directories modified this close to the scan are listed again next time,
+# since a change in the same mtime tick would otherwise go unnoticed
+RACY_WINDOW_NS = 2 * 10**9
+
+# --- FUNCTIONS ---
+
+def scan_directory(path, rel_dir='', matcher=None):
+    """
+    Lists a directory with `os.scandir` and returns `(name, is_dir, stat)` tuples.
+
+    The file type comes from the directory entry itself, so only files cost a
+    stat call; directories get a stat of None. Symlinks are followed, and
+    entries that are neither files nor directories are left out, as are
+    entries excluded by `matcher` (checked before any stat call).
+    """
+    entries = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir():
+                    if matcher is None or not matcher.is_excluded(posixpath.join(rel_dir, entry.name), True):
+                        entries.append((entry.name, True, None))
+                elif entry.is_file():
+                    if matcher is None or not matcher.is_excluded(posixpath.join(rel_dir, entry.name), False):
+                        entries.append((entry.name, False, entry.stat()))
+            except OSError:
+                # Removed or unreadable since it was listed
+                continue
+    return entries
+
+# --- CLASSES ---
+
+class LocalScanner:
+    """
+    Walks a local tree in parallel and keeps a snapshot of its directory listings.
+
+    The snapshot, stored in the sync root's StateDB, holds every directory's
+    mtime and the names it kept after exclusions. A directory whose mtime has
+    not changed since a scan with the same exclude rules is not listed again:
+    its names come from the snapshot and only its files are stat-ed. A
+    directory's mtime does not change when a file in it is edited, so files
+    are still stat-ed every time and compared against the manifest by the
+    caller.
+    """
+
+    def __init__(self, state):
+        self._state = state
+        # Entry names are stored '/'-joined, the one character a file name cannot contain
+        state.write(
+            "CREATE TABLE IF NOT EXISTS scan_snapshot ("
+            "path TEXT PRIMARY KEY, mtime_ns INTEGER, dirs TEXT, files TEXT, rules TEXT)"
+        )
+
+    def _load(self, rules):
+        snapshot = {}
+        for rel_dir, mtime_ns, dirs, files in self._state.query(
+            "SELECT path, mtime_ns, dirs, files FROM scan_snapshot WHERE rules=?", (rules,)
+        ):
+            entries = [(name, True) for name in dirs.split('/') if name]
+            entries.extend((name, False) for name in files.split('/') if name)
+            snapshot[rel_dir] = (mtime_ns, entries)
+        return snapshot
+
+    def _scan_dir(self, root, rel_dir, snapshot, matcher):
+        with metrics.span('local.scan_dir', 'disk'):
+            return self._scan_dir_entries(root, rel_dir, snapshot, matcher)
+
+    def _scan_dir_entries(self, root, rel_dir, snapshot, matcher):
+        path = os.path.join(root, *rel_dir.split('/')) if rel_dir else root
+        mtime_ns = os.stat(path).st_mtime_ns
+        saved = snapshot.get(rel_dir)
+        if saved is None or saved[0] != mtime_ns:
+            return rel_dir, mtime_ns, scan_directory(path, rel_dir, matcher), True
+
+        entries = []
+        for name, is_dir in saved[1]:
+            if is_dir:
+                entries.append((name, True, None))
+                continue
+            try:
+                entries.append((name, False, os.stat(os.path.join(path, name))))
+            except OSError:
+                continue
+        return rel_dir, mtime_ns, entries, False
+
+    @metrics.timed('local.scan', 'phase')
+    def scan(self, root, matcher=None, workers=SCAN_WORKERS):
+        """
+        Scans the tree under `root` and returns `{rel_dir: [(name, is_dir, stat), ...]}`.
+
+        Subdirectories are scanned concurrently as soon as their parent is
+        done. Entries excluded by `matcher` are left out, so excluded
+        directories are never descended into. The snapshot is replaced afterwards.
+        """
+        started_ns = time.time_ns()
+        rules = matcher.fingerprint if matcher else ''
+        snapshot = self._load(rules)
+        listings = {}
+        rows = []
+        listed = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {executor.submit(self._scan_dir, root, '', snapshot, matcher)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        rel_dir, mtime_ns, entries, relisted = future.result()
+                    except OSError as err:
+                        print(f"Could not scan directory: {err}")
+                        continue
+                    listings[rel_dir] = entries
+                    listed += relisted
+                    dirs = '/'.join(name for name, is_dir, _ in entries if is_dir)
+                    files = '/'.join(name for name, is_dir, _ in entries if not is_dir)
+                    rows.append((rel_dir, mtime_ns if started_ns - mtime_ns > RACY_WINDOW_NS else -1, dirs, files, rules))
+                    for name, is_dir, _ in entries:
+                        if is_dir:
+                            pending.add(executor.submit(self._scan_dir, root, posixpath.join(rel_dir, name), snapshot, matcher))
+
+        self._state.write("DELETE FROM scan_snapshot")
+        self._state.write("INSERT INTO scan_snapshot VALUES (?, ?, ?, ?, ?)", rows, many=True)
+        self._state.commit()
+        print(f"Scanned {len(listings)} local director(ies), {listed} listed again since the last scan.")
+        return listings
@@ -0,0 +1,187 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+# --- CONFIGURATION ---
+
+# Upper bounds of the latency histogram buckets, in milliseconds; slower calls land in a final open bucket
+LATENCY_BUCKETS_MS = tuple(2 ** n for n in range(17))
+# Percentiles reported for every operation
+PERCENTILES = (50, 90, 99)
+# Categories whose spans contain other spans, so they are left out of the time-by-category totals
+CONTAINER_CATEGORIES = ('phase', 'task')
+
+# --- FUNCTIONS ---
+
+def _error_status(exc):
+    """Returns the HTTP status of an API error, or the exception's type name."""
+    status = getattr(getattr(exc, 'resp', None), 'status', None)
+    return status if status is not None else type(exc).__name__
+
+# --- CLASSES ---
+
+class OperationStats:
+    """Aggregated timings of one kind of operation, with a log-scale latency histogram."""
+
+    def __init__(self, category):
+        self.category = category
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.bytes = 0
+        self.retries = 0
+        self.throttled = 0
+        self.wait = 0.0
+        self.statuses = {}
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def add(self, duration, span):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.bytes += span.get('bytes', 0)
+        self.retries += span.get('retries', 0)
+        self.throttled += span.get('throttled', 0)
+        self.wait += span.get('wait', 0.0)
+        if 'status' in span:
+            self.statuses[str(span['status'])] = self.statuses.get(str(span['status']), 0) + 1
+        if span.get('error'):
+            self.errors += 1
+        millis = duration * 1000
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if millis <= bound), len(LATENCY_BUCKETS_MS))
+        self.buckets[index] += 1
+
+    def percentile(self, percent):
+        """Returns the upper bound, in ms, of the bucket holding the given percentile."""
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else round(self.max * 1000, 1)
+        return 0
+
+    def to_dict(self):
+        histogram = {
+            (f"<={bound}ms" if index < len(LATENCY_BUCKETS_MS) else f">{LATENCY_BUCKETS_MS[-1]}ms"): count
+            for index, (bound, count) in enumerate(zip(LATENCY_BUCKETS_MS + (None,), self.buckets)) if count
+        }
+        return {
+            'category': self.category,
+            'count': self.count,
+            'errors': self.errors,
+            'total_s': round(self.total, 6),
+            'mean_ms': round(self.total * 1000 / self.count, 3) if self.count else 0,
+            'max_ms': round(self.max * 1000, 3),
+            **{f"p{percent}_ms": self.percentile(percent) for percent in PERCENTILES},
+            'bytes': self.bytes,
+            'retries': self.retries,
+            'throttled': self.throttled,
+            'limiter_wait_s': round(self.wait, 6),
+            'statuses': self.statuses,
+            'latency_histogram': histogram,
+        }
+
+class Metrics:
+    """
+    Records how long API calls, disk work and transfer tasks take, for --metrics-json and --trace.
+
+    Code on the hot paths wraps its work in `span(name, category)` and may
+    fill in the yielded dict with `bytes`, `retries`, `throttled`, `wait`
+    (seconds spent in the rate limiter) or `status`. Spans are aggregated per
+    name into OperationStats, and with tracing also kept as timeline events
+    for a Chrome trace (chrome://tracing or Perfetto). Until `enable` is
+    called a span only costs the context manager itself.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.tracing = False
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._events = []
+        self._threads = {}
+        self._origin = time.perf_counter()
+
+    def enable(self, trace=False):
+        self.enabled = True
+        self.tracing = trace
+        self._origin = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name, category, **fields):
+        if not self.enabled:
+            yield fields
+            return
+        started = time.perf_counter()
+        try:
+            yield fields
+        except BaseException as exc:
+            fields['error'] = True
+            fields.setdefault('status', _error_status(exc))
+            raise
+        finally:
+            self._record(name, category, started, time.perf_counter() - started, fields)
+
+    def timed(self, name, category):
+        """Decorates a function so that every call to it is recorded as a span."""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, category):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def _record(self, name, category, started, duration, fields):
+        thread = threading.current_thread()
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = OperationStats(category)
+            stats.add(duration, fields)
+            if self.tracing:
+                tid = self._threads.setdefault(thread.ident, (len(self._threads) + 1, thread.name))[0]
+                self._events.append({
+                    'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': tid,
+                    'ts': round((started - self._origin) * 1e6, 1), 'dur': round(duration * 1e6, 1),
+                    'args': fields,
+                })
+
+    def summary(self):
+        """Returns the total seconds spent per category, leaving out spans that contain others."""
+        totals = {}
+        with self._lock:
+            for stats in self._stats.values():
+                if stats.category not in CONTAINER_CATEGORIES:
+                    totals[stats.category] = totals.get(stats.category, 0.0) + stats.total
+        return totals
+
+    def write_json(self, path):
+        """Writes the per-operation statistics to `path`."""
+        with self._lock:
+            operations = {name: stats.to_dict() for name, stats in sorted(self._stats.items())}
+        data = {
+            'wall_time_s': round(time.perf_counter() - self._origin, 6),
+            'seconds_by_category': {category: round(total, 6) for category, total in sorted(self.summary().items())},
+            'operations': operations,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1)
+
+    def write_trace(self, path):
+        """Writes the recorded spans to `path` in the Chrome trace event format."""
+        with self._lock:
+            events = [
+                {'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': thread_name}}
+                for tid, thread_name in self._threads.values()
+            ] + self._events
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+# The recorder shared by all threads in this process (off unless a run asks for metrics)
+metrics = Metrics()
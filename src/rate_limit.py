@@ -0,0 +1,122 @@
+import random
+import threading
+import time
+
+from src.metrics import metrics
+
+# --- CONFIGURATION ---
+
+# Ceiling on API requests per second unless the run sets another
+DEFAULT_MAX_RATE = 100.0
+# The limiter starts at this fraction of the ceiling and ramps up from there
+INITIAL_RATE_FRACTION = 0.25
+# Never throttle below this many requests per second
+MIN_RATE = 0.5
+# Factor applied to the rate whenever the API throttles a call
+THROTTLE_DECREASE = 0.5
+# Requests per second gained per second of successful calls
+RAMP_UP = 1.0
+# Exponential backoff settings for retried calls, in seconds
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 64.0
+# Seconds of unused bandwidth a transfer may catch up on in one burst
+BANDWIDTH_BURST = 1.0
+
+# --- FUNCTIONS ---
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Returns a "full jitter" exponential backoff delay for the given retry attempt (1-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def configure(max_rate):
+    """Sets the ceiling of the shared limiter and restarts it below that ceiling."""
+    limiter.reset(max_rate)
+
+def configure_bandwidth(bytes_per_second):
+    """Caps the combined transfer rate of the process; None or 0 removes the cap."""
+    bandwidth.reset(bytes_per_second)
+
+# --- CLASSES ---
+
+class AdaptiveRateLimiter:
+    """
+    A token bucket shared by every thread that calls the Google APIs.
+
+    Each call takes a token (a batch takes one per sub-request), and tokens
+    refill at the current rate. The rate adapts additive-increase /
+    multiplicative-decrease style: it halves whenever the API throttles a
+    call and climbs back by about one request per second, per second of
+    successful calls, up to `max_rate`.
+    """
+
+    def __init__(self, max_rate=DEFAULT_MAX_RATE):
+        self._lock = threading.Lock()
+        self.reset(max_rate)
+
+    def reset(self, max_rate):
+        with self._lock:
+            self.max_rate = max(MIN_RATE, float(max_rate))
+            self.rate = max(MIN_RATE, self.max_rate * INITIAL_RATE_FRACTION)
+            self._tokens = 1.0
+            self._updated = time.monotonic()
+
+    def acquire(self, cost=1):
+        """Blocks until `cost` requests may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                capacity = max(1.0, self.rate)
+                self._tokens = min(capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= min(cost, capacity):
+                    # A cost above the bucket size drives it negative, delaying later callers
+                    self._tokens -= cost
+                    return
+                wait = (min(cost, capacity) - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + RAMP_UP / self.rate)
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(MIN_RATE, self.rate * THROTTLE_DECREASE)
+            self._tokens = min(self._tokens, 0.0)
+
+class BandwidthLimiter:
+    """
+    Paces the bytes sent and received by all transfer threads to a shared rate.
+
+    Each transfer calls `consume` with the size of a request body or chunk
+    before moving it. Calls are scheduled back to back on a virtual clock
+    running at `rate` bytes per second, so concurrent transfers split the cap
+    between them instead of each getting all of it.
+    """
+
+    def __init__(self, rate=None):
+        self._lock = threading.Lock()
+        self.reset(rate)
+
+    def reset(self, rate):
+        with self._lock:
+            self.rate = float(rate) if rate else None
+            self._next = time.monotonic()
+
+    def consume(self, nbytes):
+        """Blocks until `nbytes` may be transferred under the cap."""
+        if not self.rate or nbytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now - BANDWIDTH_BURST)
+            self._next = start + nbytes / self.rate
+            wait = start - now
+        if wait > 0:
+            with metrics.span('bandwidth.wait', 'wait', bytes=nbytes):
+                time.sleep(wait)
+
+# The limiter shared by all API calls in this process
+limiter = AdaptiveRateLimiter()
+# The transfer bandwidth cap shared by all transfers in this process (uncapped by default)
+bandwidth = BandwidthLimiter()
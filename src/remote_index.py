@@ -0,0 +1,189 @@
+import posixpath
+import threading
+import time
+
+from src.drive_api import FOLDER_MIME_TYPE, SYNC_FILE_FIELDS, iter_drive_files
+from src.metrics import metrics
+
+# --- CONFIGURATION ---
+
+# Per-file fields captured for every indexed item
+INDEX_FIELDS = f"{SYNC_FILE_FIELDS}, parents"
+# Folder IDs combined into a single "in parents" query while building the index
+PARENTS_PER_QUERY = 40
+
+# --- FUNCTIONS ---
+
+def _index_item(item):
+    """Keeps only the fields the index stores, under their Drive names."""
+    keys = ('id', 'name', 'mimeType', 'modifiedTime', 'md5Checksum', 'size')
+    return {key: item[key] for key in keys if item.get(key) is not None}
+
+# --- CLASSES ---
+
+class RemoteIndex:
+    """
+    A persistent snapshot of a Drive folder subtree, keyed by relative path.
+
+    The snapshot is built in one breadth-first pass that lists many folders
+    per query, stored in the sync root's StateDB, and trusted on later runs.
+    Callers keep it current with `put` after each write and `invalidate` when a
+    write shows an entry is stale (a 404), so folder lookups and remote diffs
+    are dictionary hits instead of list requests.
+    """
+
+    def __init__(self, state, root_id):
+        self.root_id = root_id
+        self._state = state
+        self._lock = threading.Lock()
+        self._items = {}
+        self._children = {}
+        self._by_md5 = {}
+        self.built_at = None
+        state.write(
+            "CREATE TABLE IF NOT EXISTS remote_index ("
+            "root_id TEXT, path TEXT, file_id TEXT, name TEXT, mime_type TEXT, "
+            "modified_time TEXT, md5 TEXT, size INTEGER, PRIMARY KEY (root_id, path))"
+        )
+        state.write("CREATE TABLE IF NOT EXISTS remote_roots (root_id TEXT PRIMARY KEY, built_at REAL)")
+
+        rows = state.query("SELECT built_at FROM remote_roots WHERE root_id=?", (root_id,))
+        if rows:
+            self.built_at = rows[0][0]
+            for path, file_id, name, mime_type, modified_time, md5, size in state.query(
+                "SELECT path, file_id, name, mime_type, modified_time, md5, size FROM remote_index WHERE root_id=?",
+                (root_id,)
+            ):
+                self._add(path, _index_item({
+                    'id': file_id, 'name': name, 'mimeType': mime_type,
+                    'modifiedTime': modified_time, 'md5Checksum': md5, 'size': size
+                }))
+
+    @property
+    def is_built(self):
+        return self.built_at is not None
+
+    def _add(self, rel_path, item):
+        old = self._items.get(rel_path)
+        if old and old.get('md5Checksum'):
+            self._by_md5.get(old['md5Checksum'], set()).discard(rel_path)
+        self._items[rel_path] = item
+        self._children.setdefault(posixpath.dirname(rel_path), {})[item['name']] = item
+        if item.get('md5Checksum'):
+            self._by_md5.setdefault(item['md5Checksum'], set()).add(rel_path)
+
+    def _row(self, rel_path, item):
+        return (
+            self.root_id, rel_path, item['id'], item['name'], item.get('mimeType'),
+            item.get('modifiedTime'), item.get('md5Checksum'), item.get('size')
+        )
+
+    @metrics.timed('remote.index_build', 'phase')
+    def build(self, service):
+        """Replaces the snapshot with a fresh listing of the whole subtree."""
+        print(f"Indexing remote folder tree under '{self.root_id}'...")
+        items = {}
+        level = {self.root_id: ''}
+        while level:
+            next_level = {}
+            folder_ids = list(level)
+            for i in range(0, len(folder_ids), PARENTS_PER_QUERY):
+                parents = " or ".join(f"'{folder_id}' in parents" for folder_id in folder_ids[i:i + PARENTS_PER_QUERY])
+                for item in iter_drive_files(service, f"({parents}) and trashed=false", fields=INDEX_FIELDS):
+                    parent_path = next((level[p] for p in item.get('parents', []) if p in level), None)
+                    if parent_path is None:
+                        continue
+                    rel_path = posixpath.join(parent_path, item['name'])
+                    items[rel_path] = _index_item(item)
+                    if item.get('mimeType') == FOLDER_MIME_TYPE:
+                        next_level[item['id']] = rel_path
+            level = next_level
+
+        with self._lock:
+            self._items = {}
+            self._children = {}
+            self._by_md5 = {}
+            for rel_path, item in items.items():
+                self._add(rel_path, item)
+            self.built_at = time.time()
+        self._state.write("DELETE FROM remote_index WHERE root_id=?", (self.root_id,))
+        self._state.write(
+            "INSERT INTO remote_index VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [self._row(rel_path, item) for rel_path, item in items.items()],
+            many=True
+        )
+        self._state.write("INSERT OR REPLACE INTO remote_roots VALUES (?, ?)", (self.root_id, self.built_at))
+        self._state.commit()
+        print(f"Indexed {len(items)} remote item(s).")
+
+    def lookup(self, rel_path):
+        """Returns the indexed item at `rel_path`, or None."""
+        with self._lock:
+            return self._items.get(rel_path)
+
+    def find_by_md5(self, md5):
+        """Returns `(rel_path, item)` pairs for the indexed files with this content hash."""
+        with self._lock:
+            return [(path, self._items[path]) for path in sorted(self._by_md5.get(md5, ()))]
+
+    def children(self, rel_dir):
+        """Returns a `{name: item}` copy of the indexed children of a folder."""
+        with self._lock:
+            return dict(self._children.get(rel_dir, {}))
+
+    def put(self, rel_path, item):
+        """Records an item that was just created or updated on Drive."""
+        item = _index_item(item)
+        with self._lock:
+            self._add(rel_path, item)
+        self._state.write("INSERT OR REPLACE INTO remote_index VALUES (?, ?, ?, ?, ?, ?, ?, ?)", self._row(rel_path, item))
+
+    def invalidate(self, rel_path):
+        """Drops a stale entry and everything below it, or the whole snapshot for the root path."""
+        if not rel_path:
+            self.clear()
+            return
+        prefix = rel_path + '/'
+        with self._lock:
+            for path in [p for p in self._items if p == rel_path or p.startswith(prefix)]:
+                item = self._items.pop(path)
+                if item.get('md5Checksum'):
+                    self._by_md5.get(item['md5Checksum'], set()).discard(path)
+                siblings = self._children.get(posixpath.dirname(path), {})
+                if siblings.get(item['name']) is item:
+                    del siblings[item['name']]
+                self._children.pop(path, None)
+        self._state.write(
+            "DELETE FROM remote_index WHERE root_id=? AND (path=? OR substr(path, 1, ?)=?)",
+            (self.root_id, rel_path, len(prefix), prefix)
+        )
+
+    def clear(self):
+        """Forgets the whole snapshot, so the next run rebuilds it."""
+        with self._lock:
+            self._items = {}
+            self._children = {}
+            self._by_md5 = {}
+            self.built_at = None
+        self._state.write("DELETE FROM remote_index WHERE root_id=?", (self.root_id,))
+        self._state.write("DELETE FROM remote_roots WHERE root_id=?", (self.root_id,))
+
+class FolderCache:
+    """Remembers folder IDs found by name under a parent, so repeat lookups skip the list query."""
+
+    def __init__(self, state):
+        self._state = state
+        state.write(
+            "CREATE TABLE IF NOT EXISTS folder_ids ("
+            "parent_id TEXT, name TEXT, folder_id TEXT, PRIMARY KEY (parent_id, name))"
+        )
+
+    def get(self, parent_id, name):
+        rows = self._state.query("SELECT folder_id FROM folder_ids WHERE parent_id=? AND name=?", (parent_id, name))
+        return rows[0][0] if rows else None
+
+    def put(self, parent_id, name, folder_id):
+        self._state.write("INSERT OR REPLACE INTO folder_ids VALUES (?, ?, ?)", (parent_id, name, folder_id))
+
+    def clear(self):
+        self._state.write("DELETE FROM folder_ids")
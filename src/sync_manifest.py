@@ -0,0 +1,131 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+from src.metrics import metrics
+
+# --- CONFIGURATION ---
+
+# Local state lives in this directory under the sync root
+STATE_DIR_NAME = '.reality_merge'
+STATE_DB_NAME = 'state.sqlite'
+# Read size used when hashing files
+HASH_CHUNK_SIZE = 1024 * 1024
+# Number of state writes buffered before they are committed
+COMMIT_EVERY = 200
+
+# --- FUNCTIONS ---
+
+def file_md5(path, chunk_size=HASH_CHUNK_SIZE):
+    """Computes the MD5 hex digest of a file without loading it into memory."""
+    md5 = hashlib.md5()
+    with metrics.span('local.hash', 'disk') as span, open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+        span['bytes'] = f.tell()
+    return md5.hexdigest()
+
+# --- CLASSES ---
+
+class StateDB:
+    """
+    The SQLite database holding the local sync state of one sync root.
+
+    It lives in `.reality_merge/state.sqlite` under the root and is shared by
+    the manifest, the remote index and the transfer workers through a single
+    connection guarded by a lock. Writes are committed in batches.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        state_dir = os.path.join(root, STATE_DIR_NAME)
+        os.makedirs(state_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = sqlite3.connect(os.path.join(state_dir, STATE_DB_NAME), check_same_thread=False)
+
+    def query(self, sql, params=()):
+        """Runs a read query and returns all rows."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def write(self, sql, params=(), many=False):
+        """Runs a write statement, committing once enough writes have accumulated."""
+        with self._lock:
+            if many:
+                self._conn.executemany(sql, params)
+            else:
+                self._conn.execute(sql, params)
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+
+    def commit(self):
+        """Commits all pending writes."""
+        with self._lock:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        """Commits pending writes and closes the database."""
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class SyncManifest:
+    """
+    Records what was last synced for every local file under a sync root.
+
+    Each row holds the relative path, size, mtime, local MD5 and the Drive file
+    ID it was uploaded to. A file whose size and mtime still match its row is
+    known to be unchanged without reading it.
+    """
+
+    def __init__(self, state):
+        self.root = state.root
+        self._state = state
+        self._state.write(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, md5 TEXT, file_id TEXT)"
+        )
+
+    def relpath(self, local_path):
+        """Returns the manifest key for a local path."""
+        return os.path.relpath(local_path, self.root).replace(os.sep, '/')
+
+    def get(self, rel_path):
+        """Returns the recorded entry for `rel_path` as a dict, or None."""
+        rows = self._state.query("SELECT size, mtime_ns, md5, file_id FROM files WHERE path=?", (rel_path,))
+        if not rows:
+            return None
+        size, mtime_ns, md5, file_id = rows[0]
+        return {'size': size, 'mtime_ns': mtime_ns, 'md5': md5, 'file_id': file_id}
+
+    def is_unchanged(self, entry, stat, file_id):
+        """Checks whether a manifest entry still describes a file with this stat and remote ID."""
+        return (
+            entry is not None
+            and entry['file_id'] == file_id
+            and entry['size'] == stat.st_size
+            and entry['mtime_ns'] == stat.st_mtime_ns
+        )
+
+    def record(self, rel_path, stat, md5, file_id):
+        """Stores the synced state of a file."""
+        self._state.write(
+            "INSERT OR REPLACE INTO files (path, size, mtime_ns, md5, file_id) VALUES (?, ?, ?, ?, ?)",
+            (rel_path, stat.st_size, stat.st_mtime_ns, md5, file_id)
+        )
+
+    def forget(self, rel_path):
+        """Drops the entry of a file that no longer exists at `rel_path`."""
+        self._state.write("DELETE FROM files WHERE path=?", (rel_path,))
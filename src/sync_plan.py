@@ -0,0 +1,148 @@
+import json
+import os
+import time
+
+from src.drive_api import GENERATE_IDS_LIMIT
+from src.transfer import format_bytes
+
+# --- CONFIGURATION ---
+
+# Bumped whenever the saved plan format changes
+PLAN_VERSION = 1
+# Kinds of plan actions
+PLAN_OPS = ('mkdir', 'move', 'create', 'update', 'skip')
+# Width of the action column in printed plans
+OP_WIDTH = max(len(op) for op in PLAN_OPS)
+
+# --- CLASSES ---
+
+class SyncPlan:
+    """
+    What one upload will do, computed before anything is written to Drive.
+
+    Every action is a plain dict with an `op` and the `path` it applies to,
+    relative to the sync root:
+
+    - mkdir: create a folder; `parent_id` is None when its parent is planned too.
+    - create / update: upload a new file, or new contents over `file_id`.
+    - move: move and rename the remote `file_id` from `from_path`, with no upload.
+    - skip: the file changed locally but Drive already has its contents.
+
+    File actions carry the `size`, `mtime_ns` and `md5` seen while planning, so
+    a file that changes before the plan is applied can be recognised. Files
+    left alone because their stat did not change are only counted, in
+    `unchanged`. A plan saves to and loads from JSON.
+    """
+
+    def __init__(self, local_path, root_id, dest_folder=None, subfolder=None, chunk_size=None,
+                 actions=None, unchanged=0, created_at=None):
+        self.local_path = os.path.abspath(local_path)
+        # None when the destination folder does not exist yet
+        self.root_id = root_id
+        # Where the destination is found again when it has to be created at apply time
+        self.dest_folder = dest_folder
+        self.subfolder = subfolder
+        self.chunk_size = chunk_size
+        self.actions = actions or []
+        self.unchanged = unchanged
+        self.created_at = created_at or time.time()
+
+    def add(self, op, rel_path, **fields):
+        """Appends an action and returns it."""
+        action = {'op': op, 'path': rel_path, **fields}
+        self.actions.append(action)
+        return action
+
+    def counts(self):
+        """Returns the number of actions of each kind."""
+        counts = dict.fromkeys(PLAN_OPS, 0)
+        for action in self.actions:
+            counts[action['op']] += 1
+        return counts
+
+    def bytes_to_send(self):
+        """Returns the total size of the files the plan uploads."""
+        return sum(action['size'] for action in self.actions if action['op'] in ('create', 'update'))
+
+    def estimated_api_calls(self, chunk_size):
+        """
+        Estimates the Drive API calls the plan costs, with uploads split into chunks of `chunk_size`.
+
+        Files up to the chunk size go up in one request; larger ones cost one
+        call to start the resumable session plus one per chunk. Folder creates
+        are batched but still count once each against the quota, after the
+        calls that reserve their IDs.
+        """
+        folders = self.counts()['mkdir']
+        calls = -(-folders // GENERATE_IDS_LIMIT)
+        for action in self.actions:
+            if action['op'] in ('mkdir', 'move'):
+                calls += 1
+            elif action['op'] in ('create', 'update'):
+                size = action['size']
+                calls += 1 if size <= chunk_size else 1 + -(-size // chunk_size)
+        return calls
+
+    def summary(self, chunk_size):
+        """Returns a one-line description of the plan."""
+        counts = self.counts()
+        uploads = counts['create'] + counts['update']
+        return (
+            f"Plan: {counts['mkdir']} folder(s) to create, {uploads} file(s) to upload "
+            f"({counts['create']} new, {counts['update']} changed), {counts['move']} move(s), "
+            f"{self.unchanged + counts['skip']} file(s) skipped ({counts['skip']} already on Drive); "
+            f"{format_bytes(self.bytes_to_send())} to send in about {self.estimated_api_calls(chunk_size)} API call(s)."
+        )
+
+    def print_actions(self):
+        """Prints every action, one per line."""
+        for action in self.actions:
+            op, rel_path = action['op'], action['path']
+            if op == 'mkdir':
+                detail = f"{rel_path}/"
+            elif op == 'move':
+                detail = f"{action['from_path']} -> {rel_path}"
+            elif op == 'skip':
+                detail = f"{rel_path} (contents already on Drive)"
+            else:
+                detail = f"{rel_path} ({format_bytes(action['size'])})"
+            print(f"  {op:<{OP_WIDTH}} {detail}")
+
+    def folder_levels(self):
+        """Groups the mkdir actions by depth and returns the groups, shallowest first."""
+        levels = {}
+        for action in self.actions:
+            if action['op'] == 'mkdir':
+                levels.setdefault(action['path'].count('/'), []).append(action)
+        return [levels[depth] for depth in sorted(levels)]
+
+    def to_dict(self):
+        return {
+            'version': PLAN_VERSION,
+            'local_path': self.local_path,
+            'root_id': self.root_id,
+            'dest_folder': self.dest_folder,
+            'subfolder': self.subfolder,
+            'chunk_size': self.chunk_size,
+            'created_at': self.created_at,
+            'unchanged': self.unchanged,
+            'actions': self.actions,
+        }
+
+    def save(self, path):
+        """Writes the plan to `path` as JSON."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a plan saved with `save`."""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != PLAN_VERSION:
+            raise ValueError(f"'{path}' is not a sync plan this version can apply.")
+        return cls(
+            data['local_path'], data['root_id'], dest_folder=data.get('dest_folder'), subfolder=data.get('subfolder'),
+            chunk_size=data.get('chunk_size'), actions=data['actions'], unchanged=data.get('unchanged', 0),
+            created_at=data.get('created_at')
+        )
@@ -0,0 +1,270 @@
+import heapq
+import itertools
+import queue
+import threading
+
+from src.metrics import metrics
+
+# --- CONFIGURATION ---
+
+# Default number of concurrent transfer workers
+DEFAULT_JOBS = 4
+# Pending tasks allowed per worker before producers block, when tasks run in walk order
+QUEUE_DEPTH_PER_WORKER = 8
+# Tasks of more bytes than this go to the large-file lane
+SMALL_FILE_LIMIT = 8 * 1024 * 1024
+# Orders in which queued transfers start; "walk" keeps the order they were queued in
+ORDER_POLICIES = ('walk', 'small-first', 'newest-first')
+DEFAULT_ORDER = 'small-first'
+# Seconds between progress reports while transfers are queued
+PROGRESS_INTERVAL = 10.0
+
+# --- FUNCTIONS ---
+
+def format_bytes(nbytes):
+    """Formats a byte count for progress output."""
+    if nbytes < 1024:
+        return f"{nbytes} B"
+    for unit in ('KB', 'MB', 'GB'):
+        nbytes /= 1024
+        if nbytes < 1024 or unit == 'GB':
+            return f"{nbytes:.1f} {unit}"
+
+# --- CLASSES ---
+
+class TransferPool:
+    """
+    A fixed pool of worker threads that run transfer tasks concurrently.
+
+    The httplib2 transport used by googleapiclient is not thread-safe, so each
+    worker builds its own service object with `service_factory` and passes it
+    as the first argument to every task it runs.
+
+    Tasks carry their size and mtime, and start in the `order` policy's order:
+    smallest first, newest first, or as queued ("walk"). Tasks above
+    `small_file_limit` bytes wait in a separate large-file lane that only half
+    of the workers serve, so a multi-gigabyte upload never holds up the small
+    files queued behind it. In walk order the queue is bounded, which makes a
+    producer walking a large tree block instead of buffering it; the other
+    orders see every queued task so they can sort them. Progress is reported
+    in queued bytes every `progress_interval` seconds.
+    """
+
+    def __init__(self, service_factory, jobs=DEFAULT_JOBS, queue_size=None, order='walk',
+                 small_file_limit=SMALL_FILE_LIMIT, progress_interval=None):
+        if order not in ORDER_POLICIES:
+            raise ValueError(f"Unknown transfer order '{order}'.")
+        self.jobs = max(1, jobs)
+        self._service_factory = service_factory
+        self._order = order
+        self._small_file_limit = small_file_limit
+        if queue_size is None:
+            queue_size = self.jobs * QUEUE_DEPTH_PER_WORKER if order == 'walk' else 0
+        self._queue_size = queue_size
+        self._lanes = {'small': [], 'large': []}
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._queued = 0
+        self._unfinished = 0
+        self._closing = False
+        self.errors = []
+        self.total_bytes = 0
+        self.done_bytes = 0
+        self.total_files = 0
+        self.done_files = 0
+
+        # With one worker it serves both lanes, small files first
+        large_workers = max(1, self.jobs // 2) if self.jobs > 1 else 0
+        self._threads = []
+        for i in range(self.jobs):
+            lanes = ('large', 'small') if i < large_workers else ('small', 'large') if self.jobs == 1 else ('small',)
+            thread = threading.Thread(target=self._worker, args=(lanes,), name=f"transfer-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        self._stop_progress = threading.Event()
+        self._progress_thread = None
+        if progress_interval:
+            self._progress_thread = threading.Thread(
+                target=self._report_progress, args=(progress_interval,), name="transfer-progress", daemon=True
+            )
+            self._progress_thread.start()
+
+    def _priority(self, size, mtime):
+        if self._order == 'small-first':
+            return size
+        if self._order == 'newest-first':
+            return -mtime
+        return 0
+
+    def submit(self, func, *args, size=0, mtime=0):
+        """
+        Queues `func(service, *args)`, blocking while a bounded queue is full.
+
+        `size` (bytes) and `mtime` (seconds) describe the file the task moves;
+        they pick its lane and its place in the queue.
+        """
+        lane = 'large' if size > self._small_file_limit else 'small'
+        with self._cond:
+            while self._queue_size and self._queued >= self._queue_size:
+                self._cond.wait()
+            heapq.heappush(self._lanes[lane], (self._priority(size, mtime), next(self._sequence), func, args, size))
+            self._queued += 1
+            self._unfinished += 1
+            self.total_bytes += size
+            self.total_files += 1
+            self._cond.notify_all()
+
+    def _next_task(self, lanes):
+        with self._cond:
+            while True:
+                for lane in lanes:
+                    if self._lanes[lane]:
+                        self._queued -= 1
+                        self._cond.notify_all()
+                        return heapq.heappop(self._lanes[lane])[2:]
+                if self._closing:
+                    return None
+                self._cond.wait()
+
+    def _worker(self, lanes):
+        service = None
+        while True:
+            task = self._next_task(lanes)
+            if task is None:
+                return
+            func, args, size = task
+            try:
+                if service is None:
+                    service = self._service_factory()
+                    if service is None:
+                        raise RuntimeError("Could not build a service for the transfer worker.")
+                with metrics.span(f"task.{func.__name__}", 'task', bytes=size):
+                    func(service, *args)
+            except Exception as err:
+                with self._cond:
+                    self.errors.append((func.__name__, args, err))
+                print(f"\nTransfer task '{func.__name__}' failed: {err}")
+            finally:
+                with self._cond:
+                    self._unfinished -= 1
+                    self.done_bytes += size
+                    self.done_files += 1
+                    self._cond.notify_all()
+
+    def progress(self):
+        """Returns a one-line summary of the transfers finished so far."""
+        with self._cond:
+            done, total = self.done_bytes, self.total_bytes
+            percent = f" ({int(done * 100 / total)}%)" if total else ""
+            return (
+                f"Transferred {format_bytes(done)} of {format_bytes(total)} queued{percent}, "
+                f"{self.done_files} of {self.total_files} file(s)."
+            )
+
+    def _report_progress(self, interval):
+        while not self._stop_progress.wait(interval):
+            if self._unfinished:
+                print(self.progress())
+
+    def join(self):
+        """Waits until every task queued so far has finished, keeping the workers running."""
+        with self._cond:
+            while self._unfinished:
+                self._cond.wait()
+
+    def close(self):
+        """Waits for all queued tasks, stops the workers and returns the list of errors."""
+        self.join()
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        if self._progress_thread:
+            self._stop_progress.set()
+            self._progress_thread.join()
+            if self.total_files:
+                print(self.progress())
+        return self.errors
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class BatchStage:
+    """
+    A pipeline stage that collects items from many threads and flushes them in batches.
+
+    `flush(service, items)` runs on the stage's own thread, with a service built
+    once by `service_factory`. Items are flushed when `batch_size` of them are
+    waiting, when none arrived for `max_wait` seconds, and on close. A stage
+    started with `paused=True` only buffers items until `resume` is called.
+    """
+
+    def __init__(self, service_factory, flush, batch_size, max_wait=2.0, paused=False):
+        self._service_factory = service_factory
+        self._flush = flush
+        self._batch_size = batch_size
+        self._max_wait = max_wait
+        self._queue = queue.Queue()
+        self._running = threading.Event()
+        if not paused:
+            self._running.set()
+        self.errors = []
+        self._thread = threading.Thread(target=self._run, name="batch-stage", daemon=True)
+        self._thread.start()
+
+    def put(self, item):
+        """Adds an item to the next batch."""
+        self._queue.put(item)
+
+    def resume(self):
+        """Lets a paused stage start flushing."""
+        self._running.set()
+
+    def _run(self):
+        service = None
+        pending = []
+        closing = False
+        while not closing or pending:
+            if not closing:
+                try:
+                    item = self._queue.get(timeout=self._max_wait)
+                    if item is None:
+                        closing = True
+                    else:
+                        pending.append(item)
+                        if len(pending) < self._batch_size:
+                            continue
+                except queue.Empty:
+                    pass
+            if not pending or not self._running.is_set():
+                continue
+
+            batch, pending = pending[:self._batch_size], pending[self._batch_size:]
+            try:
+                if service is None:
+                    service = self._service_factory()
+                with metrics.span(f"stage.{self._flush.__name__}", 'task', items=len(batch)):
+                    self._flush(service, batch)
+            except Exception as err:
+                self.errors.append((batch, err))
+                print(f"\nBatch stage failed: {err}")
+
+    def close(self):
+        """Flushes everything still waiting, stops the stage and returns the list of errors."""
+        self._running.set()
+        self._queue.put(None)
+        self._thread.join()
+        return self.errors
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
@@ -0,0 +1,128 @@
+import time
+
+from googleapiclient.errors import HttpError
+
+from src.drive_api import MAX_RETRIES, is_retryable_error
+from src.metrics import metrics
+from src.rate_limit import backoff_delay, bandwidth, limiter
+
+# --- CONFIGURATION ---
+
+# Upload chunk size used unless the run asks for another (a multiple of 256 KB)
+DEFAULT_UPLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+# Resumable chunks must be a multiple of this many bytes
+UPLOAD_CHUNK_ALIGNMENT = 256 * 1024
+# Statuses meaning a stored session URI has expired on the server
+EXPIRED_SESSION_STATUSES = (404, 410)
+
+# --- FUNCTIONS ---
+
+def align_chunk_size(chunk_size):
+    """Rounds a chunk size down to the 256 KB multiple that resumable uploads require."""
+    return max(UPLOAD_CHUNK_ALIGNMENT, chunk_size - chunk_size % UPLOAD_CHUNK_ALIGNMENT)
+
+def run_resumable_upload(request, sessions=None, rel_path=None, stat=None, target=None, max_retries=MAX_RETRIES):
+    """
+    Sends a resumable upload request chunk by chunk and returns the response body.
+
+    With `sessions` (an UploadSessions), the session URI and committed offset
+    are saved after every chunk. If an earlier run left a session for the same
+    file contents and `target`, the server is asked for its committed offset
+    and the upload continues from there instead of from zero.
+    """
+    saved = sessions.get(rel_path, stat, target) if sessions else None
+    if saved:
+        print(f"Resuming upload of '{rel_path}' at {saved['offset']} of {stat.st_size} bytes.")
+        request.resumable_uri = saved['session_uri']
+        # Makes next_chunk() ask the server for the committed range before sending bytes
+        request._in_error_state = True
+
+    retries = 0
+    response = None
+    while response is None:
+        waited = time.perf_counter()
+        limiter.acquire()
+        chunk_size = min(request.resumable.chunksize(), request.resumable.size() - request.resumable_progress)
+        bandwidth.consume(chunk_size)
+        try:
+            with metrics.span('drive.files.upload_chunk', 'api', bytes=chunk_size, retries=retries,
+                              wait=time.perf_counter() - waited):
+                _, response = request.next_chunk()
+            limiter.on_success()
+            retries = 0
+        except HttpError as err:
+            if saved and err.resp.status in EXPIRED_SESSION_STATUSES:
+                print(f"Previous upload session for '{rel_path}' expired. Starting over.")
+                sessions.drop(rel_path)
+                saved = None
+                request.resumable_uri = None
+                request.resumable_progress = 0
+                request._in_error_state = False
+                continue
+            if not is_retryable_error(err) or retries >= max_retries:
+                raise
+            limiter.on_throttle()
+            problem = f"Upload chunk returned {err.resp.status}"
+        except (TimeoutError, ConnectionError):
+            if retries >= max_retries:
+                print("\nUpload failed after multiple retries.")
+                raise
+            problem = "Upload timed out"
+        else:
+            if sessions and response is None:
+                sessions.save(rel_path, stat, target, request.resumable_uri, request.resumable_progress)
+            continue
+        # next_chunk() left the request in its error state, so the retry re-reads the committed offset
+        retries += 1
+        delay = backoff_delay(retries)
+        print(f"\n{problem}. Retrying in {delay:.1f}s... (Attempt {retries})")
+        time.sleep(delay)
+
+    if sessions:
+        sessions.drop(rel_path)
+    return response
+
+# --- CLASSES ---
+
+class UploadSessions:
+    """
+    Persists in-flight resumable upload sessions in the sync root's StateDB.
+
+    A session is keyed by relative path and only reused while the file keeps
+    the size and mtime it had when the session started, and while it targets
+    the same Drive operation (creating in a folder or updating a file ID).
+    """
+
+    def __init__(self, state):
+        self._state = state
+        state.write(
+            "CREATE TABLE IF NOT EXISTS upload_sessions ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, target TEXT, "
+            "session_uri TEXT, offset INTEGER, updated_at REAL)"
+        )
+
+    def get(self, rel_path, stat, target):
+        """Returns the saved session for a file as a dict, or None if there is no usable one."""
+        rows = self._state.query(
+            "SELECT size, mtime_ns, target, session_uri, offset FROM upload_sessions WHERE path=?", (rel_path,)
+        )
+        if not rows:
+            return None
+        size, mtime_ns, saved_target, session_uri, offset = rows[0]
+        if size != stat.st_size or mtime_ns != stat.st_mtime_ns or saved_target != target:
+            self.drop(rel_path)
+            return None
+        return {'session_uri': session_uri, 'offset': offset}
+
+    def save(self, rel_path, stat, target, session_uri, offset):
+        """Records the session URI and committed offset of an upload in progress."""
+        self._state.write(
+            "INSERT OR REPLACE INTO upload_sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (rel_path, stat.st_size, stat.st_mtime_ns, target, session_uri, offset, time.time())
+        )
+        # Commit right away: the point is to survive the process being killed
+        self._state.commit()
+
+    def drop(self, rel_path):
+        """Forgets the session of a finished or abandoned upload."""
+        self._state.write("DELETE FROM upload_sessions WHERE path=?", (rel_path,))
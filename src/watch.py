@@ -0,0 +1,190 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+# --- CONFIGURATION ---
+
+# Seconds without new events after which a burst of changes is pushed
+DEFAULT_DEBOUNCE = 1.0
+# Longest a steady stream of changes is held back before it is pushed anyway
+MAX_COALESCE_DELAY = 10.0
+# Seconds between scans of the polling watcher
+POLL_INTERVAL = 2.0
+
+# inotify flags, from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+READ_SIZE = 64 * 1024
+
+# --- FUNCTIONS ---
+
+def _never_excluded(rel_path, is_dir):
+    return False
+
+def open_watcher(root, is_excluded=_never_excluded):
+    """
+    Returns an inotify watcher for `root`, or a polling one where inotify is unavailable.
+
+    `is_excluded(rel_path, is_dir)` is asked about every path relative to
+    `root`; excluded directories are not watched at all.
+    """
+    try:
+        return InotifyWatcher(root, is_excluded)
+    except OSError as err:
+        print(f"inotify is not available ({err}); polling for changes every {POLL_INTERVAL:g}s.")
+        return PollingWatcher(root, is_excluded)
+
+def collect_changes(watcher, debounce=DEFAULT_DEBOUNCE, max_delay=MAX_COALESCE_DELAY):
+    """
+    Blocks until files change and returns the set of changed paths.
+
+    After the first event, changes keep being collected until none arrive for
+    `debounce` seconds (or `max_delay` passes), so a burst of writes such as
+    a build output is pushed once instead of file by file.
+    """
+    paths = set(watcher.read(None))
+    deadline = time.monotonic() + max_delay
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        more = watcher.read(min(debounce, remaining))
+        if not more:
+            break
+        paths.update(more)
+    return paths
+
+# --- CLASSES ---
+
+class InotifyWatcher:
+    """
+    Watches a directory tree with Linux inotify, through ctypes.
+
+    `read` returns the paths that changed; a newly created directory is
+    watched right away and reported as a whole. If the kernel queue overflows,
+    the root itself is reported so the caller falls back to a full sync.
+    """
+
+    def __init__(self, root, is_excluded=_never_excluded):
+        path = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(path, use_errno=True) if path else None
+        if libc is None or not hasattr(libc, 'inotify_init1'):
+            raise OSError("libc has no inotify support")
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), os.strerror(ctypes.get_errno()))
+        self.root = root
+        self._is_excluded = is_excluded
+        self._watches = {}
+        try:
+            self._watch_tree(root)
+        except OSError:
+            self.close()
+            raise
+
+    def _rel(self, path):
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def _watch_tree(self, top):
+        for dir_path, dir_names, _ in os.walk(top):
+            dir_names[:] = [name for name in dir_names if not self._is_excluded(self._rel(os.path.join(dir_path, name)), True)]
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                # ENOSPC: out of watches; let the caller fall back to polling
+                raise OSError(errno, f"{os.strerror(errno)} while watching '{dir_path}'")
+            self._watches[wd] = dir_path
+
+    def read(self, timeout=None):
+        """Waits up to `timeout` seconds (forever if None) and returns the changed paths."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return []
+        data = os.read(self._fd, READ_SIZE)
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                paths.append(self.root)
+                continue
+            if mask & (IN_IGNORED | IN_DELETE_SELF):
+                self._watches.pop(wd, None)
+                continue
+            dir_path = self._watches.get(wd)
+            if dir_path is None or not name:
+                continue
+            path = os.path.join(dir_path, name)
+            if self._is_excluded(self._rel(path), bool(mask & IN_ISDIR)):
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and os.path.isdir(path):
+                try:
+                    self._watch_tree(path)
+                except OSError as err:
+                    print(f"Could not watch '{path}': {err}")
+            paths.append(path)
+        return paths
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """Finds changed files by comparing stat snapshots of the tree, for systems without inotify."""
+
+    def __init__(self, root, is_excluded=_never_excluded, interval=POLL_INTERVAL):
+        self.root = root
+        self._is_excluded = is_excluded
+        self._interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for dir_path, dir_names, file_names in os.walk(self.root):
+            rel_dir = os.path.relpath(dir_path, self.root).replace(os.sep, '/')
+            rel_dir = '' if rel_dir == '.' else rel_dir + '/'
+            dir_names[:] = [name for name in dir_names if not self._is_excluded(rel_dir + name, True)]
+            for name in file_names:
+                if self._is_excluded(rel_dir + name, False):
+                    continue
+                path = os.path.join(dir_path, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def read(self, timeout=None):
+        """Rescans every poll interval, for up to `timeout` seconds (forever if None), and returns the changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._interval if deadline is None else min(self._interval, deadline - time.monotonic())
+            if wait > 0:
+                time.sleep(wait)
+            snapshot = self._scan()
+            changed = [path for path, state in snapshot.items() if self._snapshot.get(path) != state]
+            self._snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
@@ -0,0 +1,150 @@
+import contextlib
+import copy
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.drive_api import FOLDER_MIME_TYPE
+from src.drive_pull import apply_changes, assign_local_names, reconcile
+
+# --- CONFIGURATION ---
+
+ROOT_ID = 'root'
+
+# --- FUNCTIONS ---
+
+def _folder(file_id, name, parent_id=ROOT_ID):
+    return {'id': file_id, 'name': name, 'mimeType': FOLDER_MIME_TYPE, 'parents': [parent_id]}
+
+def _file(file_id, name, content, parent_id=ROOT_ID):
+    return {
+        'id': file_id, 'name': name, 'mimeType': 'application/octet-stream', 'parents': [parent_id],
+        'md5Checksum': hashlib.md5(content).hexdigest(), 'size': str(len(content)),
+        'modifiedTime': '2024-01-01T00:00:00.000Z',
+    }
+
+def _change(file):
+    return {'changeType': 'file', 'fileId': file['id'], 'removed': False, 'file': file}
+
+def _mirror(*files):
+    """Builds mirror items the way a first pull would, from Drive file resources."""
+    items, _ = apply_changes({}, [_change(file) for file in files], ROOT_ID)
+    return assign_local_names(items)
+
+# --- CLASSES ---
+
+class ReconcileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def write(self, rel_path, content):
+        path = os.path.join(self.root, *rel_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def read(self, rel_path):
+        with open(os.path.join(self.root, *rel_path.split('/')), 'rb') as f:
+            return f.read()
+
+    def exists(self, rel_path):
+        return os.path.exists(os.path.join(self.root, *rel_path.split('/')))
+
+    def reconcile(self, old, new):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return reconcile(self.root, old, new, ROOT_ID)
+
+    def test_folder_rename_moves_the_local_folder(self):
+        old = _mirror(_folder('f', 'docs'), _file('a', 'a.txt', b'aaa', 'f'))
+        self.write('docs/a.txt', b'aaa')
+
+        new, new_folders = apply_changes(old, [_change(_folder('f', 'notes'))], ROOT_ID)
+        downloads, skipped = self.reconcile(old, new)
+
+        self.assertEqual(new_folders, [])
+        self.assertEqual((downloads, skipped), ([], 0))
+        self.assertFalse(self.exists('docs'))
+        self.assertEqual(self.read('notes/a.txt'), b'aaa')
+
+    def test_file_moved_out_of_the_mirror_is_removed(self):
+        old = _mirror(_folder('f', 'docs'), _file('a', 'a.txt', b'aaa', 'f'), _file('b', 'b.txt', b'bbb', 'f'))
+        self.write('docs/a.txt', b'aaa')
+        self.write('docs/b.txt', b'bbb')
+
+        new, _ = apply_changes(old, [_change(_file('a', 'a.txt', b'aaa', 'elsewhere'))], ROOT_ID)
+        downloads, _ = self.reconcile(old, new)
+
+        self.assertNotIn('a', new)
+        self.assertEqual(downloads, [])
+        self.assertFalse(self.exists('docs/a.txt'))
+        self.assertEqual(self.read('docs/b.txt'), b'bbb')
+
+    def test_folder_moved_out_of_the_mirror_takes_its_files(self):
+        old = _mirror(_folder('f', 'docs'), _file('a', 'a.txt', b'aaa', 'f'))
+        self.write('docs/a.txt', b'aaa')
+
+        new, _ = apply_changes(old, [_change(_folder('f', 'docs', 'elsewhere'))], ROOT_ID)
+        self.reconcile(old, new)
+
+        self.assertEqual(new, {})
+        self.assertFalse(self.exists('docs'))
+
+    def test_removed_file_edited_locally_is_kept(self):
+        old = _mirror(_file('a', 'a.txt', b'aaa'))
+        self.write('a.txt', b'edited locally')
+
+        new, _ = apply_changes(old, [{'changeType': 'file', 'fileId': 'a', 'removed': True}], ROOT_ID)
+        self.reconcile(old, new)
+
+        self.assertEqual(self.read('a.txt'), b'edited locally')
+
+    def test_duplicate_names_get_unique_stable_local_names(self):
+        old = {}
+        new = _mirror(_file('b', 'same.txt', b'second'), _file('a', 'same.txt', b'first'))
+        downloads, _ = self.reconcile(old, new)
+        self.assertEqual(sorted(downloads), [('a', 'same.txt'), ('b', 'same_b.txt')])
+        self.write('same.txt', b'first')
+        self.write('same_b.txt', b'second')
+
+        # The plain-named sibling is renamed on Drive; the other keeps its suffixed name
+        old = copy.deepcopy(new)
+        new, _ = apply_changes(old, [_change(_file('a', 'other.txt', b'first'))], ROOT_ID)
+        downloads, _ = self.reconcile(old, new)
+
+        self.assertEqual(downloads, [])
+        self.assertEqual(self.read('other.txt'), b'first')
+        self.assertEqual(self.read('same_b.txt'), b'second')
+        self.assertFalse(self.exists('same.txt'))
+
+        # Nothing changes on a later pull with no changes
+        old = copy.deepcopy(new)
+        new, _ = apply_changes(old, [], ROOT_ID)
+        self.assertEqual(self.reconcile(old, new), ([], 0))
+        self.assertEqual(new['b']['local_name'], 'same_b.txt')
+
+class ApplyChangesTest(unittest.TestCase):
+
+    def test_changes_that_are_not_file_changes_are_skipped(self):
+        items = _mirror(_file('a', 'a.txt', b'aaa'))
+        changes = [{'changeType': 'drive', 'driveId': 'd', 'removed': True}, {'removed': False}]
+
+        new, new_folders = apply_changes(items, changes, ROOT_ID)
+
+        self.assertEqual(new, items)
+        self.assertEqual(new_folders, [])
+
+    def test_folder_moved_in_is_reported_for_listing(self):
+        items = _mirror(_folder('f', 'docs'))
+
+        new, new_folders = apply_changes(items, [_change(_folder('g', 'in', 'f'))], ROOT_ID)
+
+        self.assertEqual(new_folders, ['g'])
+        self.assertEqual(new['g']['parent'], 'f')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from src.exclude import ExcludeMatcher, parse_patterns
+
+# --- FUNCTIONS ---
+
+def _matcher(*patterns):
+    return ExcludeMatcher(parse_patterns(patterns, 'test'))
+
+# --- CLASSES ---
+
+class ExcludeMatcherTest(unittest.TestCase):
+
+    def assertExcluded(self, matcher, rel_path, is_dir=False, excluded=True):
+        self.assertEqual(matcher.is_excluded(rel_path, is_dir), excluded, rel_path)
+        # The per-rule path used by --explain must agree with the grouped regexes
+        rule = matcher.match(rel_path, is_dir)
+        self.assertEqual(rule is not None and not rule.negated, excluded, rel_path)
+
+    def assertIncluded(self, matcher, rel_path, is_dir=False):
+        self.assertExcluded(matcher, rel_path, is_dir, excluded=False)
+
+    def test_last_matching_rule_wins(self):
+        matcher = _matcher('*.log', '!keep.log')
+        self.assertExcluded(matcher, 'debug.log')
+        self.assertIncluded(matcher, 'keep.log')
+        self.assertIncluded(matcher, 'sub/keep.log')
+
+        matcher = _matcher('!keep.log', '*.log')
+        self.assertExcluded(matcher, 'keep.log')
+
+        matcher = _matcher('*.log', '!keep.log', 'sub/*.log')
+        self.assertExcluded(matcher, 'sub/keep.log')
+        self.assertIncluded(matcher, 'keep.log')
+
+    def test_double_star_matches_any_number_of_directories(self):
+        matcher = _matcher('a/**/b')
+        self.assertExcluded(matcher, 'a/b')
+        self.assertExcluded(matcher, 'a/x/b')
+        self.assertExcluded(matcher, 'a/x/y/b')
+        self.assertIncluded(matcher, 'b')
+        self.assertIncluded(matcher, 'c/a/b')
+        self.assertIncluded(matcher, 'a/xb')
+
+    def test_leading_and_trailing_double_star(self):
+        matcher = _matcher('**/cache', 'dist/**')
+        self.assertExcluded(matcher, 'cache', is_dir=True)
+        self.assertExcluded(matcher, 'x/y/cache', is_dir=True)
+        self.assertExcluded(matcher, 'dist/app.js')
+        self.assertExcluded(matcher, 'dist/sub/app.js')
+        self.assertIncluded(matcher, 'src/dist/app.js')
+
+    def test_anchored_and_unanchored_rules(self):
+        matcher = _matcher('/build', 'tmp', 'docs/out')
+        self.assertExcluded(matcher, 'build', is_dir=True)
+        self.assertIncluded(matcher, 'src/build', is_dir=True)
+        self.assertExcluded(matcher, 'tmp', is_dir=True)
+        self.assertExcluded(matcher, 'a/b/tmp', is_dir=True)
+        # A slash in the middle anchors the rule too
+        self.assertExcluded(matcher, 'docs/out', is_dir=True)
+        self.assertIncluded(matcher, 'site/docs/out', is_dir=True)
+
+    def test_dir_only_rules(self):
+        matcher = _matcher('out/', '!.*/', '.*')
+        self.assertExcluded(matcher, 'out', is_dir=True)
+        self.assertExcluded(matcher, 'src/out', is_dir=True)
+        self.assertIncluded(matcher, 'out')
+        self.assertExcluded(matcher, '.env')
+
+        matcher = _matcher('.*', '!.*/')
+        self.assertExcluded(matcher, '.env')
+        self.assertIncluded(matcher, '.github', is_dir=True)
+
+    def test_character_classes_and_escapes(self):
+        matcher = _matcher('[Ll]ibrary/', '\\#notes', '\\!important')
+        self.assertExcluded(matcher, 'Library', is_dir=True)
+        self.assertExcluded(matcher, 'library', is_dir=True)
+        self.assertIncluded(matcher, 'LIBRARY', is_dir=True)
+        self.assertExcluded(matcher, '#notes')
+        self.assertExcluded(matcher, '!important')
+
+    def test_comments_and_blank_lines_are_ignored(self):
+        self.assertEqual(parse_patterns(['# comment', '', '   ', 'a'], 'test')[0].source, 'test:4')
+
+if __name__ == '__main__':
+    unittest.main()